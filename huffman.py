@@ -1,245 +1,754 @@
-from huffman_bit_reader import *
-from huffman_bit_writer import *
-from ordered_list import *
-
-
-class HuffmanNode:
-    def __init__(self, char, freq):
-        self.char = char   # stored as an integer - the ASCII character code value
-        self.freq = freq   # the freqency associated with the node
-        self.left = None   # Huffman tree (node) to the left
-        self.right = None  # Huffman tree (node) to the right
-        
-    def __eq__(self, other):
-        '''Needed in order to be inserted into OrderedList'''
-        if type(other) != HuffmanNode:
-            return False
-        return self.freq == other.freq and self.char == other.char and self.right == other.right and self.left == other.left
-
-    def __lt__(self, other):
-        '''Needed in order to be inserted into OrderedList'''
-        if self.freq == other.freq and self.char < other.char:
-            return True
-        if self.freq < other.freq:
-            return True
-        if self.freq > other.freq:
-            return False
-        return False
-
-
-def cnt_freq(filename):
-    '''Opens a text file with a given file name (passed as a string) and counts the 
-    frequency of occurrences of all the characters within that file'''
-
-    lst = [0]*256
-    with open(filename) as f:
-        for line in f:
-            for c in line:
-                num = ord(c)
-                lst[num] += 1
-
-    return lst
-
-
-def create_huff_tree(char_freq):
-    '''Create a Huffman tree for characters with non-zero frequency
-    Returns the root node of the Huffman tree'''
-    if char_freq == []:
-        return None
-    lst = make_ordered_list(char_freq)
-    while lst.size() > 1:
-
-        a = lst.pop(0)
-        b = lst.pop(0)
-
-        newfreq = a.freq + b.freq
-        newchar = None
-
-        if a.char < b.char:
-            newchar = a.char
-        else:
-            newchar = b.char
-        # print(newchar)
-        # print(chr(newchar))
-        current = HuffmanNode(newchar, newfreq)
-        current.left = a
-        current.right = b
-
-        lst.add(current)
-
-    return lst.head.next.item
-
-
-def make_ordered_list(char_freq):
-    lst = OrderedList()
-    index = 0
-    for item in char_freq:
-        if item != 0:
-
-            lst.add(HuffmanNode(index, item))
-        index+=1
-
-    return lst
-
-# def printOrdered(lst):
-#     lst = lst.head.next
-#     while lst.item != None:
-#         print(str(lst.item.freq) + " " + str(lst.item.char) + " " + str(chr(lst.item.char)))
-#         lst = lst.next
-
-
-def create_code(node):
-    '''Returns an array (Python list) of Huffman codes. For each character, use the integer ASCII representation 
-    as the index into the arrary, with the resulting Huffman code for that character stored at that location'''
-    if node is None:
-        return None
-    lst = 256*[""]
-    str = ""
-    create_code_helper(node, lst, str)
-    return lst
-
-def create_code_helper(node, lst, str):
-
-    if not node.left and not node.right:
-        lst[node.char] = str
-    if node.left:
-        create_code_helper(node.left, lst, str + "0")
-    if node.right:
-        create_code_helper(node.right, lst, str + "1")
-
-
-def create_header(freqs):
-    '''Input is the list of frequencies. Creates and returns a header for the output file
-    Example: For the frequency list asscoaied with "aaabbbbcc, would return “97 3 98 4 99 2” '''
-    string = ""
-    index = 0
-    for item in freqs:
-        if item != 0:
-            string = string + str(index) + " " + str(item) + " "
-        index+=1
-
-    return string.strip()
-
-def huffman_encode(in_file, out_file):
-    '''Takes inout file name and output file name as parameters - both files will have .txt extensions
-    Uses the Huffman coding process on the text from the input file and writes encoded text to output file
-    Also creates a second output file which adds _compressed before the .txt extension to the name of the file.
-    This second file is actually compressed by writing individual 0 and 1 bits to the file using the utility methods 
-    provided in the huffman_bits_io module to write both the header and bits.
-    Take note of special cases - empty file and file with only one unique character'''
-
-    freqlist = cnt_freq(in_file)
-
-    Tree = create_huff_tree(freqlist)
-
-    codes = create_code(Tree)
-    header = create_header(freqlist)
-    str = ""
-    with open(in_file) as f:
-        for line in f:
-            for c in line:
-                temp = codes[ord(c)]
-                str = str + temp
-
-    with open(out_file, 'w') as f:
-        f.write(header + "\n" + str)
-
-    compressed = out_file[0:len(out_file) - 4] + "_compressed" + ".txt"
-    a = HuffmanBitWriter(compressed)
-    a.write_str(header + "\n")
-    a.write_code(str)
-    a.close()
-
-    isempty = True
-
-    with open(in_file) as f:
-        for line in f:
-            if line != "":
-                isempty = False
-
-    if isempty:
-        with open(in_file) as f:
-            if (f.readline()) == "":
-                with open(out_file, 'w') as f:
-                    pass
-                with open(compressed, 'w') as f:
-                    pass
-
-
-def huffman_decode(encoded_file, decode_file):
-
-
-    file = HuffmanBitReader(encoded_file)
-
-    str = file.read_str()
-
-    listfreq = parse_header(str)
-
-    tree = create_huff_tree(listfreq)
-    numchars = num_characters(listfreq)
-
-    string = ""
-    i = 0
-    while i < numchars:
-        currentnode = tree
-        temp = 0
-        while(currentnode.left is not None and currentnode.right is not None):
-            a = file.read_bit()
-            if a:
-                currentnode = currentnode.right
-            else:
-                currentnode = currentnode.left
-            if currentnode.left is None and currentnode.right is None:
-                temp = (currentnode.char)
-        char = chr(temp)
-        string = string + char
-        i+=1
-
-    file.close()
-    with open(decode_file, 'w') as f:
-        f.write(string)
-
-    temp = ""
-    if len(str.split()) == 2:
-        with open(decode_file, 'w') as f:
-            i = 0
-            a = str.split()
-            char = (chr(int(a[0])))
-            while i < int(a[1]):
-
-                temp = temp + char
-                i+=1
-
-            f.write(temp)
-
-            #f.write(string)
-
-    if str == "":
-        with open(decode_file, 'w') as f:
-            pass
-
-
-
-
-def num_characters(listfreq):
-    count = 0
-    for item in listfreq:
-        count+=item
-
-    return count
-
-def parse_header(header_string):
-    input = header_string.split()
-    lst = [0]*256
-    i = 0
-    while i < len(input):
-
-        index = int(input[i])
-        freq = int(input[i+1])
-
-        lst[index] = freq
-
-        i+=2
-
-    return lst
-
+import array
+import collections
+import heapq
+import io
+import os
+import sys
+from huffman_bit_reader import *
+from huffman_bit_writer import *
+from ordered_list import *
+from huffman_table_decoder import *
+from huffman_canonical import *
+from huffman_cache import *
+from huffman_stats import *
+from huffman_streams import *
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+CHUNK_SIZE = 1 << 16   # characters encoded at a time by huffman_encode and huffman_encode_stream
+FREQ_BLOCK_SIZE = 1 << 20   # bytes counted at a time by cnt_freq
+NUMPY_MIN_CHUNK = 1 << 10   # shorter pieces are coded without NumPy, it would not pay off
+
+code_cache = HuffmanCache(CACHE_SIZE, CACHE_BYTES)   # code tables and decoders shared by every encode and decode
+
+
+class HuffmanNode:
+    __slots__ = ('char', 'freq', 'left', 'right')   # no per-node __dict__
+
+    def __init__(self, char, freq):
+        self.char = char   # stored as an integer - the ASCII character code value
+        self.freq = freq   # the freqency associated with the node
+        self.left = None   # Huffman tree (node) to the left
+        self.right = None  # Huffman tree (node) to the right
+        
+    def __eq__(self, other):
+        '''Needed in order to be inserted into OrderedList. Compares the whole trees below both nodes,
+        walking them with an explicit stack instead of recursing'''
+        stack = [(self, other)]
+        while stack:
+            a, b = stack.pop()
+            if a is b:
+                continue
+            if type(a) != HuffmanNode or type(b) != HuffmanNode:
+                return False
+            if a.freq != b.freq or a.char != b.char:
+                return False
+            stack.append((a.right, b.right))
+            stack.append((a.left, b.left))
+        return True
+
+    def __lt__(self, other):
+        '''Needed in order to be inserted into OrderedList'''
+        if self.freq == other.freq and self.char < other.char:
+            return True
+        if self.freq < other.freq:
+            return True
+        if self.freq > other.freq:
+            return False
+        return False
+
+
+class HuffmanTree:
+    '''A Huffman tree stored in parallel arrays instead of one object per node. Node i has
+    character char[i], frequency freq[i] and children left[i] and right[i] (-1 for a leaf).
+    Children always come before their parent, so the root is the last node.
+    build_huff_tree makes one; node() gives the same tree as HuffmanNode objects'''
+    __slots__ = ('char', 'freq', 'left', 'right')
+
+    def __init__(self):
+        self.char = array.array('i')
+        self.freq = []    # a list, as counts are not bounded by a machine word
+        self.left = array.array('i')
+        self.right = array.array('i')
+
+    def __len__(self):
+        return len(self.char)
+
+    def add(self, char, freq, left=-1, right=-1):
+        '''Appends a node and returns its index'''
+        self.char.append(char)
+        self.freq.append(freq)
+        self.left.append(left)
+        self.right.append(right)
+        return len(self.char) - 1
+
+    def node(self):
+        '''Returns the root of the tree as HuffmanNode objects, or None for an empty tree'''
+        nodes = []
+        for i in range(len(self.char)):
+            node = HuffmanNode(self.char[i], self.freq[i])
+            if self.left[i] >= 0:
+                node.left = nodes[self.left[i]]
+                node.right = nodes[self.right[i]]
+            nodes.append(node)
+        return nodes[-1] if nodes else None
+
+    def codes(self):
+        '''Returns the same list of codes as create_code does for node(), without building the nodes'''
+        if len(self.char) == 0:
+            return None
+        lst = [""] * max(256, max(self.char) + 1)
+        prefix = [""] * len(self.char)
+        # parents come after their children, so walking backwards reaches every parent first
+        for i in range(len(self.char) - 1, -1, -1):
+            if self.left[i] < 0:
+                lst[self.char[i]] = prefix[i]
+            else:
+                prefix[self.left[i]] = prefix[i] + "0"
+                prefix[self.right[i]] = prefix[i] + "1"
+        return lst
+
+
+def cnt_freq(filename):
+    '''Opens a text file with a given file name (passed as a string) and counts the 
+    frequency of occurrences of all the characters within that file.
+    The file is read in binary blocks and counted a block at a time; line endings are
+    counted the way text mode reads them ("\\r\\n" and "\\r" both count as "\\n").
+    bytes, bytearray and memoryview inputs are counted as raw bytes'''
+
+    if isinstance(filename, (bytes, bytearray, memoryview)):
+        return count_bytes(filename)
+
+    lst = [0]*256
+    crlf = 0
+    after_cr = False   # whether the previous block ended with "\r"
+    buffer = bytearray(FREQ_BLOCK_SIZE)
+    with open(filename, 'rb') as f:
+        while True:
+            n = f.readinto(buffer)
+            if n == 0:
+                break
+            block = memoryview(buffer)[:n]
+            lst = [a + b for a, b in zip(lst, count_bytes(block))]
+            crlf += buffer.count(b"\r\n", 0, n)
+            if after_cr and buffer[0] == 10:
+                crlf += 1
+            after_cr = buffer[n - 1] == 13
+
+    if sum(lst[128:]) != 0:
+        # not plain ASCII, count the decoded characters instead of the bytes
+        return count_text(filename)
+    lst[10] += lst[13] - crlf
+    lst[13] = 0
+    return lst
+
+
+def count_bytes(data):
+    '''Returns the list of how often each of the 256 byte values occurs in bytes-like data'''
+    if numpy is not None:
+        return numpy.bincount(numpy.frombuffer(data, dtype=numpy.uint8), minlength=256).tolist()
+    lst = [0]*256
+    for byte, count in collections.Counter(data).items():
+        lst[byte] = count
+    return lst
+
+
+def count_text(filename):
+    '''Counts the characters of a file read in text mode, for files that are not plain ASCII'''
+    lst = [0]*256
+    with open(filename) as f:
+        while True:
+            chunk = f.read(FREQ_BLOCK_SIZE)
+            if chunk == "":
+                break
+            for c, count in collections.Counter(chunk).items():
+                if ord(c) > 255:
+                    raise ValueError("character " + repr(c) + " in " + str(filename) + " has no 8 bit code")
+                lst[ord(c)] += count
+    return lst
+
+
+def create_huff_tree(char_freq):
+    '''Create a Huffman tree for characters with non-zero frequency
+    Returns the root node of the Huffman tree'''
+    return build_huff_tree(char_freq).node()
+
+
+def build_huff_tree(char_freq):
+    '''Builds the same tree as create_huff_tree as a HuffmanTree, without any HuffmanNode objects'''
+    tree = HuffmanTree()
+    # Every node in the queue has a different char (an internal node takes the smallest char
+    # below it and subtrees never share leaves), so (freq, char) orders the heap exactly the
+    # way HuffmanNode.__lt__ orders the OrderedList and the trees come out identical.
+    # The node index in the last place is never reached by the comparisons
+    heap = [(freq, char, tree.add(char, freq)) for char, freq in enumerate(char_freq) if freq != 0]
+    heapq.heapify(heap)
+    while len(heap) > 1:
+        freq_a, char_a, a = heapq.heappop(heap)
+        freq_b, char_b, b = heapq.heappop(heap)
+        newfreq = freq_a + freq_b
+        newchar = min(char_a, char_b)
+        heapq.heappush(heap, (newfreq, newchar, tree.add(newchar, newfreq, a, b)))
+    return tree
+
+
+def make_ordered_list(char_freq):
+    lst = OrderedList()
+    index = 0
+    for item in char_freq:
+        if item != 0:
+
+            lst.add(HuffmanNode(index, item))
+        index+=1
+
+    return lst
+
+# def printOrdered(lst):
+#     lst = lst.head.next
+#     while lst.item != None:
+#         print(str(lst.item.freq) + " " + str(lst.item.char) + " " + str(chr(lst.item.char)))
+#         lst = lst.next
+
+
+def create_code(node):
+    '''Returns an array (Python list) of Huffman codes. For each character, use the integer ASCII representation 
+    as the index into the arrary, with the resulting Huffman code for that character stored at that location.
+    node may also be a HuffmanTree'''
+    if node is None:
+        return None
+    if isinstance(node, HuffmanTree):
+        return node.codes()
+    lst = 256*[""]
+    str = ""
+    create_code_helper(node, lst, str)
+    return lst
+
+def create_code_helper(node, lst, str):
+    '''Stores the code of every leaf below node in lst, prefixing each with str.
+    Walks the tree with an explicit stack so deep trees cannot hit the recursion limit,
+    and grows lst when the tree holds characters past the end of it'''
+    stack = [(node, str)]
+    while stack:
+        node, str = stack.pop()
+        if not node.left and not node.right:
+            if node.char >= len(lst):
+                lst.extend([""] * (node.char + 1 - len(lst)))
+            lst[node.char] = str
+        if node.right:
+            stack.append((node.right, str + "1"))
+        if node.left:
+            stack.append((node.left, str + "0"))
+
+
+def create_header(freqs):
+    '''Input is the list of frequencies. Creates and returns a header for the output file
+    Example: For the frequency list asscoaied with "aaabbbbcc, would return “97 3 98 4 99 2” '''
+    string = ""
+    index = 0
+    for item in freqs:
+        if item != 0:
+            string = string + str(index) + " " + str(item) + " "
+        index+=1
+
+    return string.strip()
+
+def huffman_encode(in_file, out_file):
+    '''Takes inout file name and output file name as parameters - both files will have .txt extensions
+    Uses the Huffman coding process on the text from the input file and writes encoded text to output file
+    Also creates a second output file which adds _compressed before the .txt extension to the name of the file.
+    This second file is actually compressed by writing individual 0 and 1 bits to the file using the utility methods 
+    provided in the huffman_bits_io module to write both the header and bits.
+    Take note of special cases - empty file and file with only one unique character'''
+
+    rec = start_recording("huffman_encode")
+    with rec.time("count"):
+        freqlist = cnt_freq(in_file)
+
+    with rec.time("tree"):
+        codes = cached_codes(freqlist)
+        header = create_header(freqlist)
+
+    compressed = os.path.splitext(out_file)[0] + "_compressed" + ".txt"
+
+    if num_characters(freqlist) == 0:
+        # an empty input file gives two empty output files
+        with open(out_file, 'w') as f:
+            pass
+        with open(compressed, 'w') as f:
+            pass
+        rec.finish()
+        return
+
+    with open(out_file, 'w') as f:
+        a = HuffmanBitWriter(compressed)
+        f.write(header + "\n")
+        a.write_str(header + "\n")
+        for chunk in rec.timed("read", read_chunks(in_file)):
+            with rec.time("emit"):
+                str = encode_chunk(chunk, codes)
+            with rec.time("write"):
+                f.write(str)
+                a.write_code(str)
+            rec.count(symbols=len(chunk), bits=len(str))
+        with rec.time("write"):
+            a.close()
+    if rec:
+        rec.count(bytes_in=os.path.getsize(in_file), bytes_out=a.bytes_written)
+    rec.finish()
+
+
+def huffman_encode_stream(in_file, compressed_file, chunk_size=CHUNK_SIZE, canonical=False, sync_interval=None,
+                          binary=False, max_length=None):
+    '''Writes only the compressed file for in_file, without the text file of 0s and 1s.
+    The input is read once to count the characters and once more in pieces of chunk_size
+    characters, each packed into bits as soon as it is encoded, so memory use does not
+    grow with the size of the input. The output is identical to the _compressed file of huffman_encode.
+    With canonical=True the file gets the compact code-length header of huffman_canonical instead
+    and the characters are coded with canonical codes of the same lengths.
+    With sync_interval=N the canonical file also gets an index of the bit offset of every Nth
+    character (format version 3), so decode_range can start decoding close to any character.
+    With binary=True in_file is read as raw bytes, not as text: nothing is decoded and line
+    endings are kept, so any file (images, archives, ...) comes back byte for byte from
+    huffman_decode(..., binary=True). The characters are then the byte values.
+    With max_length (12 or 15, say) no code is longer than that many bits, which bounds the code
+    width the integer and NumPy code tables (see code_table) and the bit reader and writer work with,
+    at the price of slightly worse compression, see length_limit_loss. The decoder's byte-at-a-time
+    tables are the same size either way. Such files are always canonical'''
+
+    if sync_interval or max_length:
+        canonical = True
+    rec = start_recording("huffman_encode_stream")
+    with rec.time("count"):
+        if binary:
+            with open(in_file, 'rb') as f:
+                freqlist = count_file(f)
+        else:
+            freqlist = cnt_freq(in_file)
+    with rec.time("tree"):
+        numchars = num_characters(freqlist)
+        if canonical:
+            lengths, codes = cached_canonical(freqlist, max_length)
+        else:
+            codes = cached_codes(freqlist)
+
+    if numchars == 0 and not canonical:
+        with open(compressed_file, 'w') as f:
+            pass
+        rec.finish()
+        return
+
+    table = code_table(codes)
+    a = HuffmanBitWriter(compressed_file)
+    if sync_interval:
+        a.write_bytes(create_canonical_header(numchars, lengths, FORMAT_INDEXED))
+    elif canonical:
+        a.write_bytes(create_canonical_header(numchars, lengths))
+    else:
+        a.write_str(create_header(freqlist) + "\n")
+    start = a.tell_bits()
+    offsets = []    # bit offsets of the sync points
+    written = 0     # characters encoded so far
+    for chunk in rec.timed("read", read_chunks(in_file, chunk_size, binary)):
+        for piece in split_at_sync_points(chunk, written, sync_interval):
+            if sync_interval and written > 0 and written % sync_interval == 0:
+                offsets.append(a.tell_bits() - start)
+            bits = write_chunk(a, piece, codes, table, rec)
+            rec.count(symbols=len(piece), bits=bits)
+            written += len(piece)
+    with rec.time("write"):
+        if sync_interval:
+            a.align()
+            a.write_bytes(pack_sync_index(offsets, a.tell_bits() // 8, sync_interval))
+        a.close()
+    if rec:
+        rec.count(bytes_in=os.path.getsize(in_file), bytes_out=a.bytes_written)
+    rec.finish()
+
+
+def read_chunks(filename, chunk_size=CHUNK_SIZE, binary=False):
+    '''Yields the text of a file in pieces of at most chunk_size characters,
+    or with binary=True its raw bytes in pieces of at most chunk_size bytes'''
+    with open(filename, 'rb' if binary else 'r') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+
+def split_at_sync_points(chunk, position, interval):
+    '''Returns chunk, which starts at character number position, cut wherever a multiple of interval
+    falls inside it. Without an interval the chunk is returned whole'''
+    if not interval:
+        return [chunk]
+    first = -position % interval
+    pieces = [chunk[:first]] if first else []
+    pieces += [chunk[i:i + interval] for i in range(first, len(chunk), interval)]
+    return [piece for piece in pieces if piece]
+
+
+def code_table(codes, cache=code_cache):
+    '''Returns the integer code tables pack_codes uses for a list of code strings, indexed by character:
+    (code values, code lengths) for single characters and the same for every pair of characters,
+    indexed by 256 * first + second, all as NumPy uint64 arrays.
+    Returns None without NumPy or if a code is longer than 32 bits, so a pair fits in 64 bits.
+    The tables are kept in cache, pass None for codes that will not be seen again'''
+    if numpy is None or len(codes) != 256 or max(len(code) for code in codes) > 32:
+        return None
+    if cache is None:
+        return build_code_table(codes)
+    return cache.get(("table", tuple(codes)), lambda: build_code_table(codes))
+
+
+def build_code_table(codes):
+    values = numpy.array([int(code, 2) if code else 0 for code in codes], dtype=numpy.uint64)
+    lengths = numpy.array([len(code) for code in codes], dtype=numpy.uint64)
+    pair_values = ((values[:, None] << lengths[None, :]) | values[None, :]).ravel()
+    pair_lengths = (lengths[:, None] + lengths[None, :]).ravel()
+    return values, lengths, pair_values, pair_lengths
+
+
+def pack_codes(data, table):
+    '''Returns (packed bytes, number of bits) for the codes of the bytes-like data, using the arrays
+    from code_table. The whole block is coded with array operations, two characters at a time:
+    the running sum of the code lengths gives the bit offset of every code, from which each code
+    is shifted into place in a 64 bit word (or split over two), the codes of each word are added
+    up (their bits never overlap) and the words are written out big-endian'''
+    values, lengths, pair_values, pair_lengths = table
+    n_bytes = len(data)
+    pairs = numpy.frombuffer(data, dtype='>u2', count=n_bytes // 2)
+    code_values = pair_values.take(pairs)
+    code_lengths = pair_lengths.take(pairs)
+    if n_bytes % 2:
+        last = memoryview(data)[n_bytes - 1]
+        code_values = numpy.append(code_values, values[last])
+        code_lengths = numpy.append(code_lengths, lengths[last])
+    if len(code_lengths) == 0:
+        return b"", 0
+
+    ends = numpy.cumsum(code_lengths)
+    n_bits = int(ends[-1])
+    word = ((ends - code_lengths) >> numpy.uint64(6)).astype(numpy.intp)
+    end_in_word = ends - (word.astype(numpy.uint64) << numpy.uint64(6))   # can be past 64
+    spill = numpy.flatnonzero(end_in_word > 64)
+    # codes ending inside their word are shifted left into place; numpy turns the out of
+    # range shifts of the codes that spill into 0s, and those are replaced just below
+    parts = code_values << (numpy.uint64(64) - end_in_word)
+    parts[spill] = code_values[spill] >> (end_in_word[spill] - numpy.uint64(64))
+
+    words = numpy.zeros((n_bits >> 6) + 2, dtype=numpy.uint64)
+    first = numpy.flatnonzero(numpy.diff(word, prepend=-1))
+    words[word[first]] = numpy.add.reduceat(parts, first)
+    words[word[spill] + 1] |= code_values[spill] << (numpy.uint64(128) - end_in_word[spill])
+    return words.astype('>u8').tobytes()[:(n_bits + 7) >> 3], n_bits
+
+
+def write_chunk(a, chunk, codes, table=None, rec=NULL_RECORDER):
+    '''Writes the codes for a piece of text or bytes to the HuffmanBitWriter a and returns the number
+    of bits written. With a table from code_table the codes are packed by pack_codes;
+    otherwise (no NumPy) the strings from encode_chunk are written.
+    rec records the coding as the "emit" stage and handing the bits to a as "write"'''
+    if table is not None and len(chunk) >= NUMPY_MIN_CHUNK:
+        with rec.time("emit"):
+            if isinstance(chunk, str):
+                # text only reaches the encoder when every character is below 256
+                chunk = chunk.encode('latin-1')
+            packed, n_bits = pack_codes(chunk, table)
+        with rec.time("write"):
+            a.write_packed(packed, n_bits)
+        return n_bits
+    with rec.time("emit"):
+        bits = encode_chunk(chunk, codes)
+    with rec.time("write"):
+        a.write_code(bits)
+    return len(bits)
+
+
+def encode_chunk(chunk, codes):
+    '''Returns the string of 0s and 1s for a piece of text, or for a bytes-like piece of raw bytes'''
+    if isinstance(chunk, str):
+        return "".join([codes[ord(c)] for c in chunk])
+    return "".join([codes[byte] for byte in chunk])
+
+
+def compress(data, max_length=None, streams=1):
+    '''Compresses bytes-like data and returns the compressed bytes, without touching the filesystem.
+    The bytes are coded as they are (no text decoding) into the canonical format of huffman_canonical.
+    max_length limits the codes to that many bits (see canonical_table). streams above 1 (usually
+    STREAM_COUNT) splits the bits into that many independently decodable streams, see huffman_streams'''
+    rec = start_recording("compress")
+    out = io.BytesIO()
+    view = memoryview(data)
+    with rec.time("count"):
+        freqlist = cnt_freq(view)
+    write_compressed(freqlist, (view[start:start + CHUNK_SIZE] for start in range(0, len(view), CHUNK_SIZE)), out, rec,
+                     max_length, streams)
+    rec.finish()
+    return out.getvalue()
+
+
+def decompress(blob, workers=1, executor=None):
+    '''Returns the original bytes of a blob made by compress. The contents of a compressed file
+    with the "char freq" text header, read into memory, decompress as well.
+    Multi-stream blobs have their streams decoded on workers processes (see read_decoder)'''
+    out = io.BytesIO()
+    decompress_file(io.BytesIO(blob), out, workers, executor)
+    return out.getvalue()
+
+
+def compress_file(in_f, out_f, max_length=None, streams=1):
+    '''Compresses everything read from the binary file object in_f into the binary file object out_f,
+    in the same format as compress (max_length and streams too). in_f is read twice, once to count and once to encode, so it
+    must be seekable; only one block of it is held in memory at a time'''
+    rec = start_recording("compress")
+    start = in_f.tell()
+    with rec.time("count"):
+        freqlist = count_file(in_f)
+    in_f.seek(start)
+    write_compressed(freqlist, rec.timed("read", iter(lambda: in_f.read(CHUNK_SIZE), b"")), out_f, rec, max_length,
+                     streams)
+    rec.finish()
+
+
+def count_file(in_f):
+    '''Returns the byte frequencies of everything read from the binary file object in_f, a block at a time'''
+    freqlist = [0]*256
+    while True:
+        block = in_f.read(FREQ_BLOCK_SIZE)
+        if not block:
+            return freqlist
+        freqlist = [a + b for a, b in zip(freqlist, count_bytes(block))]
+
+
+def decompress_file(in_f, out_f, workers=1, executor=None):
+    '''Decompresses the binary file object in_f into the binary file object out_f a block at a time.
+    Multi-stream files have their streams decoded on workers processes (see read_decoder)'''
+    rec = start_recording("decompress")
+    file = HuffmanBitReader(in_f)
+    with rec.time("header"):
+        decoder, numchars = read_decoder(file, workers, executor)
+    for piece in rec.timed("decode", decoder.decode_blocks(rec.timed("read", file.mapped_blocks()), numchars)):
+        with rec.time("write"):
+            out_f.write(piece)
+        rec.count(symbols=len(piece), bytes_out=len(piece))
+    rec.count(bytes_in=file.bytes_read)
+    file.close()
+    rec.finish()
+
+
+def write_compressed(freqlist, chunks, out_f, rec=NULL_RECORDER, max_length=None, streams=1):
+    '''Writes the canonical header for freqlist and the codes for every bytes-like chunk to out_f.
+    This is the engine shared by compress and compress_file; rec records its stages and
+    max_length limits the length of the codes. With streams above 1 the codes go to that many
+    streams in memory, written out after the jump table once the last chunk is coded'''
+    with rec.time("tree"):
+        lengths, codes = cached_canonical(freqlist, max_length)
+
+    if streams < 1:
+        raise ValueError("cannot code into " + str(streams) + " streams")
+    table = code_table(codes)
+    numchars = num_characters(freqlist)
+    a = HuffmanBitWriter(out_f)
+    if streams == 1:
+        a.write_bytes(create_canonical_header(numchars, lengths))
+        writers = [a]
+        pieces = ((0, chunk) for chunk in chunks)
+    else:
+        a.write_bytes(create_canonical_header(numchars, lengths, FORMAT_STREAMS))
+        writers = [HuffmanBitWriter(io.BytesIO()) for _ in range(streams)]
+        pieces = split_streams(chunks, stream_counts(numchars, streams))
+    for stream, chunk in pieces:
+        bits = write_chunk(writers[stream], chunk, codes, table, rec)
+        rec.count(bytes_in=len(chunk), symbols=len(chunk), bits=bits)
+    with rec.time("write"):
+        if streams > 1:
+            for writer in writers:
+                writer.close()
+            parts = [writer.file.getvalue() for writer in writers]
+            a.write_bytes(pack_jump_table([len(part) for part in parts]))
+            for part in parts:
+                a.write_bytes(part)
+        a.close()
+    rec.count(bytes_out=a.bytes_written)
+
+
+def split_streams(chunks, counts):
+    '''Yields (stream, piece) for the pieces of chunks that go to each stream, where stream i
+    takes the next counts[i] characters'''
+    stream = 0
+    left = counts[0]
+    for chunk in chunks:
+        view = memoryview(chunk) if not isinstance(chunk, str) else chunk
+        while len(view):
+            while left == 0:
+                stream += 1
+                left = counts[stream]
+            piece = view[:left]
+            view = view[len(piece):]
+            left -= len(piece)
+            yield stream, piece
+
+
+def read_decoder(file, workers=1, executor=None):
+    '''Reads either kind of header from a HuffmanBitReader and returns (HuffmanTableDecoder, number of characters).
+    The canonical code-length header gives the codes straight away, no tree is built.
+    Decoders are kept in code_cache, so a header seen before costs no table building.
+    A multi-stream header gets a MultiStreamDecoder, which decodes large streams on executor,
+    or on a shared pool of workers processes when workers is above 1'''
+    if is_canonical(file):
+        streams = peek_version(file) == FORMAT_STREAMS
+        numchars, lengths = read_canonical_header(file)
+        decoder = code_cache.get(("lengths", bytes(lengths)), lambda: HuffmanTableDecoder(None, canonical_codes(lengths)))
+        if streams:
+            decoder = MultiStreamDecoder(decoder, lengths, workers, executor)
+        return decoder, numchars
+
+    header = file.read_str()
+    return code_cache.get(("header", header), lambda: build_decoder(header))
+
+
+def build_decoder(header):
+    '''Returns (HuffmanTableDecoder, number of characters) for a "char freq" text header'''
+    listfreq = parse_header(header)
+    return HuffmanTableDecoder(create_huff_tree(listfreq)), num_characters(listfreq)
+
+
+def cached_codes(freqlist):
+    '''Returns create_code(create_huff_tree(freqlist)), from code_cache when the same frequencies were seen before.
+    The list is shared, do not change it'''
+    return code_cache.get(("codes", tuple(freqlist)), lambda: build_huff_tree(freqlist).codes())
+
+
+def canonical_table(freqlist, max_length=None):
+    '''Returns (code lengths, canonical codes) for a frequency list.
+    With max_length, codes the Huffman tree makes longer than max_length bits are
+    replaced by the best codes that are not, from limited_code_lengths'''
+    lengths = code_lengths(freqlist, build_huff_tree(freqlist).codes())
+    if max_length is not None and max(lengths, default=0) > max_length:
+        lengths = limited_code_lengths(freqlist, max_length)
+    return lengths, canonical_codes(lengths)
+
+
+def cached_canonical(freqlist, max_length=None):
+    '''Returns canonical_table(freqlist, max_length), from code_cache when it was built before'''
+    return code_cache.get(("canonical", tuple(freqlist), max_length), lambda: canonical_table(freqlist, max_length))
+
+
+def length_limit_loss(freqlist, max_length):
+    '''Returns (encoded bits with Huffman codes, encoded bits with codes of at most max_length bits)
+    for a frequency list, to see what limiting the code length costs'''
+    return (encoded_bits(freqlist, canonical_table(freqlist)[0]),
+            encoded_bits(freqlist, canonical_table(freqlist, max_length)[0]))
+
+
+def huffman_decode(encoded_file, decode_file, binary=False, workers=1, executor=None):
+    '''Reads the header and the encoded bits from encoded_file and writes the decoded text to decode_file.
+    Both the "char freq" text header and the canonical code-length header are understood.
+    The bits are decoded a byte at a time with the lookup tables of HuffmanTableDecoder, straight from
+    a memory map of encoded_file, and the text is written out as it is decoded.
+    With binary=True the decoded characters are written as raw bytes, as needed for files
+    encoded with huffman_encode_stream(..., binary=True) or compress.
+    Multi-stream files have their streams decoded on workers processes (see read_decoder)'''
+
+    rec = start_recording("huffman_decode")
+    file = HuffmanBitReader(encoded_file)
+    with rec.time("header"):
+        decoder, numchars = read_decoder(file, workers, executor)
+
+    # every character code is below 256, so latin-1 maps each byte straight back to chr(code)
+    with open(decode_file, 'wb' if binary else 'w') as f:
+        for piece in rec.timed("decode", decoder.decode_blocks(rec.timed("read", file.mapped_blocks()), numchars)):
+            with rec.time("write"):
+                f.write(piece if binary else piece.decode('latin-1'))
+            rec.count(symbols=len(piece))
+    rec.count(bytes_in=file.bytes_read)
+    file.close()
+    if rec:
+        rec.count(bytes_out=os.path.getsize(decode_file))
+    rec.finish()
+
+
+def huffman_decode_buffer(encoded_file, out=None):
+    '''Decodes encoded_file (a file name or a binary file object) into memory and returns the decoded bytes
+    in a bytearray of exactly as many bytes as there are characters, allocated once up front.
+    out may instead be any writable buffer (a bytearray, a memoryview, an mmap of an output file)
+    with room for all the characters; it is filled from the start and returned.
+    The compressed file is memory mapped, so only the output needs to fit in memory'''
+    rec = start_recording("decompress")
+    file = HuffmanBitReader(encoded_file)
+    try:
+        with rec.time("header"):
+            decoder, numchars = read_decoder(file)
+        if out is None:
+            out = bytearray(numchars)
+        with rec.time("decode"):
+            decoder.decode_into(file.mapped_blocks(), numchars, out)
+        rec.count(bytes_in=file.bytes_read, bytes_out=numchars, symbols=numchars)
+    finally:
+        file.close()
+        rec.finish()
+    return out
+
+
+def decode_range(compressed_file, start, length):
+    '''Returns the length characters from character number start on (fewer at the end of the file)
+    of a file written by huffman_encode_stream with a sync_interval, as bytes.
+    Decoding starts at the last sync point at or before start, so the cost grows with
+    length and the sync interval, not with the size of the file'''
+    with open(compressed_file, 'rb') as f:
+        interval, offsets = read_sync_index(f)
+        f.seek(0)
+        file = HuffmanBitReader(f)
+        try:
+            decoder, numchars = read_decoder(file)
+            first_byte = file.tell()
+        finally:
+            file.close()
+        length = min(length, numchars - start)
+        if start < 0 or length <= 0:
+            return b""
+
+        sync = min(start // interval, len(offsets) - 1)
+        f.seek(first_byte + offsets[sync] // 8)
+        lead = start - sync * interval   # characters decoded before start
+        blocks = iter(lambda: f.read(BLOCK_SIZE), b"")
+        data = b"".join(decoder.decode_blocks(blocks, lead + length, offsets[sync] % 8))
+    return data[lead:]
+
+
+def num_characters(listfreq):
+    count = 0
+    for item in listfreq:
+        count+=item
+
+    return count
+
+def parse_header(header_string):
+    '''Returns the frequency list of a "char freq" text header.
+    Raises ValueError if the header is not pairs of a character code (0 to 255) and a count'''
+    input = header_string.split()
+    if len(input) % 2:
+        raise ValueError("odd number of tokens in text header")
+    lst = [0]*256
+    i = 0
+    while i < len(input):
+
+        index = int(input[i])
+        freq = int(input[i+1])
+        if not 0 <= index < 256 or freq < 0:
+            raise ValueError("bad character " + input[i] + " or count " + input[i+1] + " in text header")
+
+        lst[index] = freq
+
+        i+=2
+
+    return lst
+
+
+if __name__ == '__main__':
+    # python -m huffman compress|decompress|bench ..., see huffman_cli
+    import huffman_cli
+    sys.exit(huffman_cli.main())
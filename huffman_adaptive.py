@@ -0,0 +1,222 @@
+#
+#   Single pass (adaptive) compression for streams of unknown length
+#
+#   The encoder and the decoder start from the same code table, 8 bits for every
+#   byte, and after every block both add the block to their byte counts and, from
+#   time to time, build new canonical codes from those counts. Since both sides
+#   see the same blocks they change tables at the same points, so no table is
+#   ever stored and output can start with the first block.
+#   Stream layout (integers are unsigned LEB128):
+#       FORMAT_MAGIC, version byte FORMAT_ADAPTIVE
+#       rebuild interval
+#       blocks: number of bytes coded, number of bytes of code, the code padded to a whole byte
+#       0, which ends the stream
+#
+
+import io
+
+from huffman import *
+
+ADAPTIVE_BLOCK_SIZE = 1 << 16   # most bytes coded in one block
+REBUILD_INTERVAL = 1 << 18      # most bytes coded between two rebuilds of the code table
+ADAPTIVE_MAX_LENGTH = 15        # longest code the rebuilt tables may use
+
+start_cache = HuffmanCache(2)   # the decoder and code table of the starting codes, the same for every stream
+
+
+class AdaptiveModel:
+    '''The code table the encoder and decoder keep in step. Tables are rebuilt after the
+    first block and then each time the bytes coded since the last rebuild reach the bytes
+    coded before it, or rebuild_interval, whichever is smaller'''
+
+    def __init__(self, rebuild_interval=REBUILD_INTERVAL):
+        if rebuild_interval < 1:
+            raise ValueError("rebuild interval must be at least 1")
+        self.rebuild_interval = rebuild_interval
+        self.freqs = [1]*256   # every byte keeps a code, even before it is seen
+        self.total = 0         # bytes coded so far
+        self.since = 0         # bytes coded since the last rebuild
+        self.lengths = [8]*256
+        self.codes = canonical_codes(self.lengths)
+        self.table = None     # the code table of the current codes, built when first coded with
+        self.rebuilt = False
+        self.current = None   # the decoder of the current rebuilt codes, dropped at the next rebuild
+
+    def update(self, block):
+        '''Counts a block that was just coded and rebuilds the codes when it is time'''
+        self.freqs = [a + b for a, b in zip(self.freqs, count_bytes(block))]
+        self.total += len(block)
+        self.since += len(block)
+        if self.since >= min(self.rebuild_interval, self.total - self.since):
+            self.lengths, self.codes = canonical_table(self.freqs, ADAPTIVE_MAX_LENGTH)
+            self.table = None
+            self.rebuilt = True
+            self.current = None
+            self.since = 0
+
+    def decoder(self):
+        '''Returns the HuffmanTableDecoder for the current codes. Rebuilt codes are seldom seen twice,
+        so their decoders stay with the model instead of filling code_cache'''
+        if not self.rebuilt:
+            return start_cache.get(("lengths", bytes(self.lengths)), lambda: HuffmanTableDecoder(None, self.codes))
+        if self.current is None:
+            self.current = HuffmanTableDecoder(None, self.codes)
+        return self.current
+
+    def code_table(self):
+        '''Returns the code table of the current codes for write_chunk. The starting table is
+        shared through start_cache, rebuilt ones are made once and kept until the next rebuild'''
+        if self.table is None:
+            self.table = code_table(self.codes, None if self.rebuilt else start_cache)
+        return self.table
+
+    def __getstate__(self):
+        # the tables are rebuilt on the other side rather than pickled with the model,
+        # so a model sent to a process pool every block carries only its counts and codes
+        return dict(self.__dict__, table=None, current=None)
+
+
+class AdaptiveEncoder:
+    '''Compresses a stream in one pass. feed(data) returns the compressed bytes of every
+    whole block of block_size bytes so far and keeps the rest; flush() returns the rest too,
+    so a reader can decode everything fed so far; close() ends the stream'''
+
+    def __init__(self, rebuild_interval=REBUILD_INTERVAL, block_size=ADAPTIVE_BLOCK_SIZE):
+        self.model = AdaptiveModel(rebuild_interval)
+        self.block_size = block_size
+        self.pending = bytearray()   # bytes fed but not coded yet
+        self.header = FORMAT_MAGIC + bytes([FORMAT_ADAPTIVE]) + pack_uint(rebuild_interval)
+        self.closed = False
+
+    def feed(self, data):
+        '''Adds bytes-like data to the stream and returns the compressed bytes ready so far'''
+        if self.closed:
+            raise ValueError("feed after close")
+        self.pending += data
+        whole = len(self.pending) - len(self.pending) % self.block_size
+        out = self.encode(self.pending[:whole])
+        del self.pending[:whole]
+        return out
+
+    def flush(self):
+        '''Returns the compressed bytes of everything fed so far that feed held back'''
+        if self.closed:
+            return b""
+        out = self.encode(self.pending)
+        self.pending = bytearray()
+        return out
+
+    def close(self):
+        '''Returns the last compressed bytes of the stream, ending it'''
+        out = self.flush()
+        if not self.closed:
+            out += self.take_header() + pack_uint(0)
+            self.closed = True
+        return out
+
+    def encode(self, data):
+        # codes data as blocks of at most block_size bytes, each with the table of the moment
+        out = io.BytesIO()
+        out.write(self.take_header())
+        for start in range(0, len(data), self.block_size):
+            block = data[start:start + self.block_size]
+            bits = io.BytesIO()
+            a = HuffmanBitWriter(bits)
+            write_chunk(a, block, self.model.codes, self.model.code_table())
+            a.close()
+            out.write(pack_uint(len(block)) + pack_uint(len(bits.getvalue())))
+            out.write(bits.getvalue())
+            self.model.update(block)
+        return out.getvalue()
+
+    def take_header(self):
+        # the stream header goes out with the first bytes returned
+        header = self.header
+        self.header = b""
+        return header
+
+
+class AdaptiveDecoder:
+    '''Decompresses a stream made by AdaptiveEncoder as its bytes arrive. feed(data) accepts
+    the compressed bytes in pieces of any size and returns the bytes of every block completed'''
+
+    def __init__(self):
+        self.model = None            # made once the stream header has arrived
+        self.buffer = bytearray()    # compressed bytes not decoded yet
+        self.eof = False             # whether the end of the stream was seen
+
+    def feed(self, data):
+        '''Adds compressed bytes and returns the decompressed bytes they complete'''
+        self.buffer += data
+        out = []
+        while not self.eof:
+            if self.model is None:
+                if not self.read_header():
+                    break
+                continue
+            count, pos = unpack_uint(self.buffer, 0)
+            if count == 0:
+                self.eof = True
+                del self.buffer[:pos]
+                break
+            if count is None:
+                break
+            size, pos = unpack_uint(self.buffer, pos)
+            if size is None or len(self.buffer) < pos + size:
+                break
+            block = self.model.decoder().decode(bytes(self.buffer[pos:pos + size]), count)
+            del self.buffer[:pos + size]
+            self.model.update(block)
+            out.append(block)
+        if self.eof and self.buffer:
+            raise ValueError("data after the end of the adaptive stream")
+        return b"".join(out)
+
+    def flush(self):
+        '''Returns the decompressed bytes of any whole blocks still held back (normally none)'''
+        return self.feed(b"")
+
+    def close(self):
+        '''Checks that the whole stream arrived, raises ValueError if it was cut off'''
+        if not self.eof:
+            raise ValueError("adaptive stream ended early")
+
+    def read_header(self):
+        # returns False while the header is incomplete
+        size = len(FORMAT_MAGIC) + 1
+        if len(self.buffer) < size:
+            return False
+        if self.buffer[:len(FORMAT_MAGIC)] != FORMAT_MAGIC or self.buffer[len(FORMAT_MAGIC)] != FORMAT_ADAPTIVE:
+            raise ValueError("not an adaptive Huffman stream")
+        interval, pos = unpack_uint(self.buffer, size)
+        if interval is None:
+            return False
+        self.model = AdaptiveModel(interval)
+        del self.buffer[:pos]
+        return True
+
+
+def huffman_encode_adaptive(in_f, out_f, rebuild_interval=REBUILD_INTERVAL):
+    '''Compresses the binary file object in_f into the binary file object out_f in one pass.
+    in_f is read once, a block at a time, so pipes and sockets work; with read1 (as on
+    sys.stdin.buffer) whatever has arrived is coded and written without waiting for a whole block'''
+    encoder = AdaptiveEncoder(rebuild_interval)
+    read = getattr(in_f, 'read1', in_f.read)
+    while True:
+        data = read(ADAPTIVE_BLOCK_SIZE)
+        if not data:
+            break
+        out_f.write(encoder.feed(data) + encoder.flush())
+    out_f.write(encoder.close())
+
+
+def huffman_decode_adaptive(in_f, out_f):
+    '''Decompresses the adaptive stream read from the binary file object in_f into out_f'''
+    decoder = AdaptiveDecoder()
+    read = getattr(in_f, 'read1', in_f.read)
+    while True:
+        data = read(ADAPTIVE_BLOCK_SIZE)
+        if not data:
+            break
+        out_f.write(decoder.feed(data))
+    decoder.close()
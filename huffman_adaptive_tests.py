@@ -0,0 +1,64 @@
+import unittest
+import io
+import random
+from huffman_adaptive import *
+
+
+class TestAdaptive(unittest.TestCase):
+
+    def test_round_trip(self):
+        with open("declaration.txt", 'rb') as f:
+            data = f.read()
+        rng = random.Random(1)
+        encoder = AdaptiveEncoder(rebuild_interval=1000, block_size=700)
+        pieces = []
+        pos = 0
+        while pos < len(data):
+            size = rng.randint(0, 900)
+            pieces.append(encoder.feed(data[pos:pos + size]))
+            pos += size
+        pieces.append(encoder.close())
+        stream = b"".join(pieces)
+        self.assertTrue(stream.startswith(FORMAT_MAGIC + bytes([FORMAT_ADAPTIVE])))
+        self.assertLess(len(stream), len(compress(data)) * 1.1)
+
+        # the decoder takes the stream in pieces of any size, down to single bytes
+        for size in [1, 13, len(stream)]:
+            decoder = AdaptiveDecoder()
+            out = b"".join(decoder.feed(stream[i:i + size]) for i in range(0, len(stream), size))
+            decoder.close()
+            self.assertEqual(out + decoder.flush(), data)
+
+    def test_flush(self):
+        encoder = AdaptiveEncoder()
+        decoder = AdaptiveDecoder()
+        self.assertEqual(decoder.feed(encoder.feed(b"hello ")), b"")
+        self.assertEqual(decoder.feed(encoder.flush()), b"hello ")
+        self.assertEqual(decoder.feed(encoder.feed(b"world") + encoder.flush()), b"world")
+        with self.assertRaises(ValueError):
+            decoder.close()
+        self.assertEqual(decoder.feed(encoder.close()), b"")
+        decoder.close()
+        with self.assertRaises(ValueError):
+            encoder.feed(b"more")
+
+        decoder = AdaptiveDecoder()
+        self.assertEqual(decoder.feed(AdaptiveEncoder().close()), b"")
+        decoder.close()
+        with self.assertRaises(ValueError):
+            AdaptiveDecoder().feed(compress(b"not adaptive"))
+
+    def test_files(self):
+        with open("file_WAP.txt", 'rb') as f:
+            data = f.read(300000)
+        compressed = io.BytesIO()
+        huffman_encode_adaptive(io.BytesIO(data), compressed)
+        decoded = io.BytesIO()
+        huffman_decode_adaptive(io.BytesIO(compressed.getvalue()), decoded)
+        self.assertEqual(decoded.getvalue(), data)
+        with self.assertRaises(ValueError):
+            huffman_decode_adaptive(io.BytesIO(compressed.getvalue()[:-1]), io.BytesIO())
+
+
+if __name__ == '__main__':
+    unittest.main()
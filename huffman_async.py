@@ -0,0 +1,61 @@
+#
+#   asyncio wrappers around the single pass engine of huffman_adaptive
+#
+#   compress_stream and decompress_stream copy an asyncio.StreamReader to an
+#   asyncio.StreamWriter (or anything with the same read, write and drain
+#   methods) a block at a time. Coding a block is handed to an executor so the
+#   event loop keeps serving other streams, and the next block is only read
+#   once the writer has drained, so a slow reader at the other end holds back
+#   its producer instead of filling memory.
+#
+
+import asyncio
+
+from huffman_adaptive import *
+
+STREAM_CHUNK_SIZE = ADAPTIVE_BLOCK_SIZE   # bytes read from the reader at a time
+
+
+def feed_encoder(encoder, data):
+    '''Returns (encoder, compressed bytes for data). Run in an executor; in a process pool
+    the encoder travels both ways, so its state carries over from block to block'''
+    return encoder, encoder.feed(data) + encoder.flush()
+
+
+def feed_decoder(decoder, data):
+    '''Returns (decoder, decompressed bytes completed by data), like feed_encoder'''
+    return decoder, decoder.feed(data)
+
+
+async def compress_stream(reader, writer, executor=None, rebuild_interval=REBUILD_INTERVAL,
+                          chunk_size=STREAM_CHUNK_SIZE):
+    '''Compresses everything read from reader into an adaptive stream written to writer.
+    Blocks are coded on executor (the loop's default thread pool when None; a
+    ProcessPoolExecutor works too). The writer is drained after every block but not closed'''
+    loop = asyncio.get_running_loop()
+    encoder = AdaptiveEncoder(rebuild_interval, chunk_size)
+    while True:
+        data = await reader.read(chunk_size)
+        if not data:
+            break
+        encoder, out = await loop.run_in_executor(executor, feed_encoder, encoder, data)
+        writer.write(out)
+        await writer.drain()
+    writer.write(encoder.close())
+    await writer.drain()
+
+
+async def decompress_stream(reader, writer, executor=None, chunk_size=STREAM_CHUNK_SIZE):
+    '''Decompresses an adaptive stream read from reader into writer, like compress_stream.
+    Raises ValueError if the reader ends before the stream does'''
+    loop = asyncio.get_running_loop()
+    decoder = AdaptiveDecoder()
+    while True:
+        data = await reader.read(chunk_size)
+        if not data:
+            break
+        decoder, out = await loop.run_in_executor(executor, feed_decoder, decoder, data)
+        if out:
+            writer.write(out)
+            await writer.drain()
+    decoder.close()
@@ -0,0 +1,81 @@
+import unittest
+import asyncio
+import concurrent.futures
+import io
+import pickle
+from huffman_async import *
+
+
+class BytesWriter:
+    '''Collects what a StreamWriter would send, drain yields to the loop like a real one'''
+
+    def __init__(self):
+        self.out = io.BytesIO()
+        self.drains = 0
+
+    def write(self, data):
+        self.out.write(data)
+
+    async def drain(self):
+        self.drains += 1
+        await asyncio.sleep(0)
+
+
+def reader_for(data):
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+async def round_trip(data, executor=None, chunk_size=STREAM_CHUNK_SIZE):
+    compressed = BytesWriter()
+    await compress_stream(reader_for(data), compressed, executor, chunk_size=chunk_size)
+    decompressed = BytesWriter()
+    await decompress_stream(reader_for(compressed.out.getvalue()), decompressed, executor, chunk_size)
+    return compressed, decompressed.out.getvalue()
+
+
+class TestAsync(unittest.TestCase):
+
+    def test_round_trip(self):
+        with open("declaration.txt", 'rb') as f:
+            data = f.read()
+        compressed, out = asyncio.run(round_trip(data, chunk_size=1000))
+        self.assertEqual(out, data)
+        self.assertGreaterEqual(compressed.drains, len(data) // 1000)
+
+        # the output is an ordinary adaptive stream
+        decoded = io.BytesIO()
+        huffman_decode_adaptive(io.BytesIO(compressed.out.getvalue()), decoded)
+        self.assertEqual(decoded.getvalue(), data)
+
+        with concurrent.futures.ProcessPoolExecutor(2) as pool:
+            self.assertEqual(asyncio.run(round_trip(data, pool, 3000))[1], data)
+
+        # what crosses to a process pool every block is the model state, not its tables
+        encoder, out = feed_encoder(AdaptiveEncoder(1000, 1000), data)
+        self.assertLess(len(pickle.dumps(encoder)), 20000)
+        self.assertEqual(pickle.loads(pickle.dumps(encoder)).flush(), encoder.flush())
+
+    def test_many_streams(self):
+        async def main():
+            inputs = [(b"stream %d " % i) * (50 + i) for i in range(200)]
+            results = await asyncio.gather(*(round_trip(data) for data in inputs))
+            return inputs, [out for compressed, out in results]
+
+        inputs, outputs = asyncio.run(main())
+        self.assertEqual(outputs, inputs)
+
+    def test_truncated(self):
+        async def main():
+            compressed = BytesWriter()
+            await compress_stream(reader_for(b"abc" * 100), compressed)
+            await decompress_stream(reader_for(compressed.out.getvalue()[:-1]), BytesWriter())
+
+        with self.assertRaises(ValueError):
+            asyncio.run(main())
+
+
+if __name__ == '__main__':
+    unittest.main()
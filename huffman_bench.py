@@ -0,0 +1,231 @@
+#
+#   Benchmarks for the Huffman encoder and decoder
+#
+#   Times every stage of the pipeline over the bundled text files and a few
+#   generated inputs and prints the results as JSON, so runs from two commits
+#   can be compared:
+#       python huffman_bench.py > before.json
+#       python huffman_bench.py --compare before.json
+#
+#   Memory is reported per stage as peak_alloc_bytes, the tracemalloc peak of one
+#   call, which counts only what that call allocated. max_rss_kb is the peak resident
+#   size of the whole benchmark process (interpreter, NumPy, every stage run so far),
+#   so it only bounds the coder from above and is not comparable between stages.
+#   decompress_streams_workers decodes a multi-stream blob on --workers processes; set
+#   against decompress_streams it shows the speedup on a multi-core machine. Streams
+#   below PARALLEL_STREAM_SIZE are decoded in process, so only large corpora show it,
+#   and its peak_alloc_bytes counts the parent process alone.
+#
+
+import argparse
+import json
+import os
+import platform
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from huffman import *
+
+CORPORA = ["file1.txt", "declaration.txt", "multiline.txt", "file_WAP.txt"]
+SYNTHETIC_SIZE = 1 << 20   # characters in each generated input
+
+
+def make_synthetic(directory, size=SYNTHETIC_SIZE, seed=1):
+    '''Writes the generated inputs to directory and returns their file names.
+    skewed: a few letters make up most of the text; uniform: all 95 printable characters
+    equally often; large_alphabet: all 256 character codes (stored as UTF-8)'''
+    rng = random.Random(seed)
+    letters = "etaoinshrdlucmfwypvbgkjqxz"
+    weights = [0.5 ** (i / 2) for i in range(len(letters))]
+    texts = {
+        "skewed.txt": "".join(rng.choices(letters, weights, k=size)),
+        "uniform.txt": "".join(rng.choices([chr(c) for c in range(32, 127)], k=size)),
+        # "\r" is left out, text mode would turn it into "\n"
+        "large_alphabet.txt": "".join(rng.choices([chr(c) for c in range(256) if c != 13], k=size)),
+    }
+    names = []
+    for name, text in texts.items():
+        path = os.path.join(directory, name)
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+        names.append(path)
+    return names
+
+
+def measure(func, repeat):
+    '''Returns (best wall time of repeat calls, peak traced allocation of one call).
+    The timed calls run without tracemalloc, which would slow them down'''
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+
+def read_all_bits(compressed_file):
+    '''Reads every bit after the header of compressed_file in 12 bit steps, the way a table decoder does'''
+    f = HuffmanBitReader(compressed_file)
+    f.read_str()
+    while True:
+        f.peek_bits(12)
+        try:
+            f.consume(12)
+        except EOFError:
+            break
+    f.close()
+
+
+def bench_file(path, directory, repeat, workers=1):
+    '''Returns a list of result dicts, one per stage, for one input file.
+    Multi-stream decoding is timed on one process and on workers processes'''
+    size = os.path.getsize(path)
+    out_file = os.path.join(directory, "bench_out.txt")
+    compressed = os.path.join(directory, "bench_out_compressed.txt")
+    decoded = os.path.join(directory, "bench_decoded.txt")
+    written = os.path.join(directory, "bench_written.txt")
+
+    freqlist = cnt_freq(path)
+    tree = create_huff_tree(freqlist)
+    codes = create_code(tree)
+    with open(path) as f:
+        bits = encode_chunk(f.read(), codes)
+    with open(path, 'rb') as f:
+        blob = compress(f.read(), streams=STREAM_COUNT)
+    if workers > 1:
+        decompress(blob, workers)   # starts the stream pool outside the timed runs
+
+    def write_bits():
+        a = HuffmanBitWriter(written)
+        a.write_code(bits)
+        a.close()
+
+    def encode():
+        code_cache.clear()
+        huffman_encode(path, out_file)
+
+    def decode():
+        code_cache.clear()
+        huffman_decode(compressed, decoded)
+
+    stages = [
+        ("cnt_freq", lambda: cnt_freq(path)),
+        ("create_huff_tree", lambda: create_huff_tree(freqlist)),
+        ("create_code", lambda: create_code(tree)),
+        ("huffman_encode", encode),
+        ("huffman_decode", decode),
+        ("bit_writer", write_bits),
+        ("bit_reader", lambda: read_all_bits(compressed)),
+        ("decompress_streams", lambda: decompress(blob)),
+        ("decompress_streams_workers", lambda: decompress(blob, workers)),
+    ]
+    results = []
+    for stage, func in stages:
+        seconds, peak = measure(func, repeat)
+        results.append({
+            "corpus": os.path.basename(path),
+            "bytes": size,
+            "stage": stage,
+            "seconds": seconds,
+            "mb_per_s": size / seconds / 1e6 if seconds > 0 else None,
+            "peak_alloc_bytes": peak,
+        })
+    results.append({
+        "corpus": os.path.basename(path),
+        "bytes": size,
+        "stage": "ratio",
+        "compressed_bytes": os.path.getsize(compressed),
+    })
+    return results
+
+
+def git_commit():
+    '''Returns the commit the benchmark runs on, or None outside a git checkout'''
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(corpora=None, repeat=3, synthetic_size=SYNTHETIC_SIZE, workers=None):
+    '''Runs every stage over corpora (the bundled files by default) and the generated
+    inputs and returns the report as a dict ready for json.dump. workers (all cores by
+    default) decode the multi-stream stage'''
+    if corpora is None:
+        corpora = CORPORA
+    if workers is None:
+        workers = os.cpu_count() or 1
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        paths = list(corpora)
+        if synthetic_size > 0:
+            paths += make_synthetic(directory, synthetic_size)
+        for path in paths:
+            results.extend(bench_file(path, directory, repeat, workers))
+    return {
+        "commit": git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "repeat": repeat,
+        "workers": workers,
+        "max_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        "results": results,
+    }
+
+
+def compare(old, new):
+    '''Returns lines comparing the stage times and traced peak allocations of two reports,
+    as new / old'''
+    old_results = {(r["corpus"], r["stage"]): r for r in old["results"] if "seconds" in r}
+    lines = []
+    for r in new["results"]:
+        key = (r["corpus"], r["stage"])
+        before = old_results.get(key)
+        if "seconds" in r and before and before["seconds"]:
+            line = "%-22s %-18s %8.4fs -> %8.4fs  x%.2f" % (key[0], key[1], before["seconds"], r["seconds"],
+                                                            r["seconds"] / before["seconds"])
+            if before.get("peak_alloc_bytes"):
+                line += "   peak alloc x%.2f" % (r["peak_alloc_bytes"] / before["peak_alloc_bytes"])
+            lines.append(line)
+    return lines
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Huffman encoder and decoder stages")
+    parser.add_argument("corpora", nargs="*", help="input files (default: the bundled text files)")
+    parser.add_argument("--repeat", type=int, default=3, help="timed runs per stage, the best is kept")
+    parser.add_argument("--synthetic-size", type=int, default=SYNTHETIC_SIZE,
+                        help="characters per generated input, 0 to skip them")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes decoding the multi-stream stage (default: all cores)")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--compare", help="earlier JSON report to compare the new stage times against")
+    args = parser.parse_args(argv)
+
+    report = run(args.corpora or None, args.repeat, args.synthetic_size, args.workers)
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare) as f:
+            old = json.load(f)
+        print("\n".join(compare(old, report)), file=sys.stderr)
+
+
+if __name__ == '__main__':
+    main()
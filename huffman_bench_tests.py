@@ -0,0 +1,46 @@
+import unittest
+import contextlib
+import io
+import json
+import os
+import tempfile
+from huffman_bench import *
+
+
+class TestBench(unittest.TestCase):
+
+    def test_report_and_compare(self):
+        report = run(["file1.txt"], repeat=1, synthetic_size=500)
+        corpora = {r["corpus"] for r in report["results"]}
+        self.assertEqual(corpora, {"file1.txt", "skewed.txt", "uniform.txt", "large_alphabet.txt"})
+        stages = [r for r in report["results"] if r["corpus"] == "file1.txt" and "seconds" in r]
+        self.assertEqual([r["stage"] for r in stages], ["cnt_freq", "create_huff_tree", "create_code", "huffman_encode",
+                                                        "huffman_decode", "bit_writer", "bit_reader",
+                                                        "decompress_streams", "decompress_streams_workers"])
+        for r in stages:
+            self.assertGreaterEqual(r["seconds"], 0)
+            self.assertGreater(r["peak_alloc_bytes"], 0)
+        self.assertIn("compressed_bytes", report["results"][-1])
+
+        lines = compare(report, report)
+        self.assertEqual(len(lines), len([r for r in report["results"] if r.get("seconds")]))
+        self.assertTrue(all("x1.00" in line for line in lines))
+        self.assertEqual(compare({"results": []}, report), [])
+
+    def test_main(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            before = os.path.join(tmp, "before.json")
+            main(["file1.txt", "--repeat", "1", "--synthetic-size", "0", "--output", before])
+            with open(before) as f:
+                report = json.load(f)
+            self.assertEqual({r["corpus"] for r in report["results"]}, {"file1.txt"})
+
+            err = io.StringIO()
+            with contextlib.redirect_stderr(err), contextlib.redirect_stdout(io.StringIO()):
+                main(["file1.txt", "--repeat", "1", "--synthetic-size", "0", "--compare", before])
+            self.assertIn("huffman_encode", err.getvalue())
+            self.assertIn("peak alloc", err.getvalue())
+
+
+if __name__ == '__main__':
+    unittest.main()
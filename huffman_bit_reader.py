@@ -1,43 +1,184 @@
-#
-#   Bit-packing reader and writer for Huffman encoder and decoder
-#
-
-import struct 
-   
-# --------------------------------------------------------------------
-# HuffmanBitReader is a HuffmanBitReader(string)
-class HuffmanBitReader:
-    # side effect: open a file with file name 'fname' for reading in binary mode
-    def __init__(self, fname):
-        self.file = open(fname, 'rb')
-        self.n_bits = 0
-        self.byte = 0
-        self.mask = 0
-
-    # side effect: closes opened file  
-    def close(self):
-        self.file.close()
-      
-    # Use this method to read the header from the compressed file. 
-    def read_str(self): 
-        data = self.file.readline()
-        return data.decode('utf-8')
-   
-    # Use this method to read a single bit from opened file
-    # It returns False if a 0 was read, 1 otherwise
-    def read_bit(self):  
-        if self.mask == 0:     # all bits consumed, need to read in the next byte
-            self.byte = self.read_byte()
-            self.mask = 1 << 7
-        bit = self.byte & self.mask
-        self.mask = self.mask >> 1
-        if bit == 0:
-            return False
-        else:
-            return True
-         
-    # Reads a 1 byte from opened file and returns as unsigned int
-    # You should not need to call this method
-    def read_byte(self):
-        return struct.unpack('B', self.file.read(1))[0]  # 1 byte unsigned int      
-
+#
+#   Bit-packing reader and writer for Huffman encoder and decoder
+#
+
+import io
+import mmap
+
+BLOCK_SIZE = 1 << 16   # bytes read from the file at a time
+
+# --------------------------------------------------------------------
+# HuffmanBitReader is a HuffmanBitReader(string)
+# The file is read in blocks of BLOCK_SIZE bytes. Bits are taken from the
+# current block into an int so peek_bits/consume/read_bits can hand out
+# many bits per call
+class HuffmanBitReader:
+    # side effect: open a file with file name 'fname' for reading in binary mode
+    # fname may also be a file object opened for binary reading (e.g. io.BytesIO),
+    # which is read as is and left open by close
+    def __init__(self, fname):
+        self.owns_file = not hasattr(fname, 'read')
+        self.file = open(fname, 'rb') if self.owns_file else fname
+        self.data = b""                  # current block read from the file
+        self.view = memoryview(self.data)
+        self.pos = 0                     # index of the next unread byte in the block
+        self.n_bits = 0                  # Number of bits taken from the block but not yet consumed
+        self.bits = 0                    # those bits represented as an int
+        self.bytes_read = 0              # bytes read from the file so far
+
+    # side effect: closes opened file
+    def close(self):
+        self.view.release()
+        if self.owns_file:
+            self.file.close()
+
+    # Use this method to read the header from the compressed file.
+    def read_str(self):
+        self.unread()
+        line = b""
+        while True:
+            end = self.data.find(b"\n", self.pos)
+            if end != -1:
+                line += self.view[self.pos:end + 1]
+                self.pos = end + 1
+                break
+            line += self.view[self.pos:]
+            self.pos = len(self.data)
+            if not self.fill():
+                break
+        return line.decode('utf-8')
+
+    # Use this method to read a single bit from opened file
+    # It returns False if a 0 was read, 1 otherwise
+    def read_bit(self):
+        return self.read_bits(1) == 1
+
+    # Returns the next n bits as an int without consuming them
+    # Past the end of the file the missing bits read as 0s
+    def peek_bits(self, n):
+        if self.n_bits < n:
+            self.take(n - self.n_bits)
+            if self.n_bits < n:
+                return (self.bits << (n - self.n_bits)) & ((1 << n) - 1)
+        return (self.bits >> (self.n_bits - n)) & ((1 << n) - 1)
+
+    # Skips the next n bits, raises EOFError if the file has fewer left
+    def consume(self, n):
+        if self.n_bits < n:
+            self.take(n - self.n_bits)
+            if self.n_bits < n:
+                raise EOFError("only " + str(self.n_bits) + " of " + str(n) + " bits left")
+        self.n_bits -= n
+        self.bits &= (1 << self.n_bits) - 1
+
+    # Returns the next n bits as an int and consumes them
+    def read_bits(self, n):
+        value = self.peek_bits(n)
+        self.consume(n)
+        return value
+
+    # Reads the rest of the opened file and returns it as bytes
+    # Any bits left over from a partly read byte are not included
+    def read_bytes(self):
+        self.unread()
+        block = self.file.read()
+        self.bytes_read += len(block)
+        rest = self.view[self.pos:].tobytes() + block
+        self.pos = len(self.data)
+        return rest
+
+    # Yields the rest of the opened file as a series of bytes blocks, like read_bytes
+    # but without holding the whole file in memory
+    def read_blocks(self):
+        self.unread()
+        if self.pos < len(self.data):
+            yield self.view[self.pos:].tobytes()
+            self.pos = len(self.data)
+        while True:
+            block = self.file.read(BLOCK_SIZE)
+            if not block:
+                return
+            self.bytes_read += len(block)
+            yield block
+
+    # Yields the rest of the opened file like read_blocks, but as memoryviews of a read-only
+    # memory map of the file instead of copies read into memory. The pages are loaded by the
+    # OS as the blocks are used, so even a very large file costs little resident memory.
+    # Each block is released when the next one is asked for, so do not keep them around.
+    # File objects that cannot be mapped (io.BytesIO, pipes, empty files) use read_blocks
+    def mapped_blocks(self):
+        self.unread()
+        try:
+            mapping = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        except (AttributeError, OSError, ValueError):
+            yield from self.read_blocks()
+            return
+        # the file offset of self.data[self.pos], the first byte not handed out yet
+        start = self.file.tell() - (len(self.data) - self.pos)
+        self.pos = len(self.data)
+        self.bytes_read -= self.file.tell() - start
+        self.file.seek(0, io.SEEK_END)
+        with mapping:
+            if hasattr(mapping, 'madvise'):
+                mapping.madvise(mmap.MADV_SEQUENTIAL)
+            view = memoryview(mapping)
+            try:
+                for offset in range(start, len(mapping), BLOCK_SIZE):
+                    block = view[offset:offset + BLOCK_SIZE]
+                    self.bytes_read += len(block)
+                    try:
+                        yield block
+                    finally:
+                        block.release()
+            finally:
+                view.release()
+
+    # Returns the offset, from where reading started, of the first whole byte not yet read
+    def tell(self):
+        return self.bytes_read - (len(self.data) - self.pos) - (self.n_bits >> 3)
+
+    # Reads a 1 byte from opened file and returns as unsigned int
+    # You should not need to call this method
+    def read_byte(self):
+        return self.read_bits(8)
+
+    # Moves whole bytes from the blocks into self.bits until at least n more bits are held
+    # or the file ends. You should not need to call this method
+    def take(self, n):
+        while n > 0:
+            if self.pos == len(self.data) and not self.fill():
+                return
+            count = min((n + 7) >> 3, len(self.data) - self.pos)
+            chunk = int.from_bytes(self.view[self.pos:self.pos + count], 'big')
+            self.pos += count
+            self.bits = (self.bits << (count << 3)) | chunk
+            self.n_bits += count << 3
+            n -= count << 3
+
+    # Puts the whole bytes held in self.bits back in front of the block, keeping
+    # only the bits of a partly read byte. You should not need to call this method
+    def unread(self):
+        count = self.n_bits >> 3
+        if count == 0:
+            return
+        left = self.n_bits & 7
+        rest = (self.bits >> left).to_bytes(count, 'big') + self.view[self.pos:].tobytes()
+        self.view.release()
+        self.data = rest
+        self.view = memoryview(self.data)
+        self.pos = 0
+        self.bits &= (1 << left) - 1
+        self.n_bits = left
+
+    # Reads the next block of the file, returns False at the end of the file
+    # You should not need to call this method
+    def fill(self):
+        block = self.file.read(BLOCK_SIZE)
+        if not block:
+            return False
+        self.bytes_read += len(block)
+        self.view.release()
+        self.data = block
+        self.view = memoryview(self.data)
+        self.pos = 0
+        return True
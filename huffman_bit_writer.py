@@ -1,34 +1,120 @@
-import struct 
-
-#   Bit-packing writer for Huffman encoder
-class HuffmanBitWriter:
-    # side effect: open a file with file name 'fname' for writing in binary mode
-    def __init__(self, fname):
-        self.file = open(fname, 'wb') # open a file with file name fname
-        self.n_bits = 0               # Number of accumulated bits so far
-        self.byte = 0                 # accumulated bits represented as byte 
-
-   # Use this method to close the compressed file 
-    def close(self):
-      # need to pad remaining bits in byte with 0s and write them to file
-        if self.n_bits > 0:
-            self.byte = self.byte << (7-self.n_bits)
-            self.file.write(struct.pack('B', self.byte)) 
-        self.file.close()
-      
-    # Use this method to write the header to the compressed file. 
-    def write_str(self, str): # str is a string
-        self.file.write(str.encode('utf-8'))
-   
-    # Use this method to write individual 0 and 1 bits to the compressed file  
-    def write_code(self, code): # code is a string of '0's and '1's
-        for bit in code:
-            if bit == '1': self.byte += 1
-            if self.n_bits == 7:
-                self.file.write(struct.pack('B', self.byte)) 
-                self.byte = 0
-                self.n_bits = 0
-            else:
-                self.byte = self.byte << 1
-                self.n_bits += 1
-   
+#   Bit-packing writer for Huffman encoder
+#   Bits are collected in a Python int and packed into a bytearray, which is
+#   written to the file in blocks of BUFFER_SIZE bytes
+
+BUFFER_SIZE = 1 << 16   # bytes collected before they are written to the file
+PACK_BITS = 1 << 12     # bits collected by write_codes before they are packed into bytes
+
+class HuffmanBitWriter:
+    # side effect: open a file with file name 'fname' for writing in binary mode
+    # fname may also be a file object opened for binary writing (e.g. io.BytesIO),
+    # which is written to as is and left open by close
+    def __init__(self, fname):
+        self.owns_file = not hasattr(fname, 'write')
+        self.file = open(fname, 'wb') if self.owns_file else fname # open a file with file name fname
+        self.n_bits = 0               # Number of accumulated bits not yet packed into bytes
+        self.bits = 0                 # accumulated bits represented as an int
+        self.buffer = bytearray()     # packed bytes not yet written to the file
+        self.bytes_written = 0        # bytes handed to the file so far
+
+    # Use this method to close the compressed file
+    def close(self):
+        self.align()
+        self.flush()
+        if self.owns_file:
+            self.file.close()
+
+    # Pads the last partly written byte with 0s, so whatever comes next starts on a byte boundary
+    def align(self):
+        self.pack()
+        if self.n_bits > 0:
+            self.buffer.append(self.bits << (8 - self.n_bits))
+            self.bits = 0
+            self.n_bits = 0
+
+    # Returns the number of bits written so far, headers included
+    def tell_bits(self):
+        return (self.bytes_written + len(self.buffer)) * 8 + self.n_bits
+
+    # Use this method to write the header to the compressed file.
+    def write_str(self, str): # str is a string
+        # whole bytes go out first, a partial byte stays behind for the next bits
+        self.pack()
+        self.flush()
+        data = str.encode('utf-8')
+        self.file.write(data)
+        self.bytes_written += len(data)
+
+    # Use this method to write a binary header to the compressed file, like write_str
+    def write_bytes(self, data): # data is bytes-like
+        self.pack()
+        self.flush()
+        self.file.write(data)
+        self.bytes_written += len(data)
+
+    # Use this method to write individual 0 and 1 bits to the compressed file
+    def write_code(self, code): # code is a string of '0's and '1's
+        if code:
+            self.write_bits(int(code, 2), len(code))
+
+    # Writes the lowest 'length' bits of the int 'code', most significant bit first
+    def write_bits(self, code, length):
+        self.bits = (self.bits << length) | code
+        self.n_bits += length
+        if self.n_bits >= 8:
+            self.pack()
+
+    # Writes every (code, length) pair from an iterable, as write_bits would
+    def write_codes(self, codes):
+        bits = self.bits
+        n_bits = self.n_bits
+        for code, length in codes:
+            bits = (bits << length) | code
+            n_bits += length
+            if n_bits >= PACK_BITS:
+                self.bits = bits
+                self.n_bits = n_bits
+                self.pack()
+                bits = self.bits
+                n_bits = self.n_bits
+        self.bits = bits
+        self.n_bits = n_bits
+        self.pack()
+
+    # Writes the first n_bits bits of the bytes-like data, most significant bit first, the same as
+    # write_code would for those bits. Lets a caller pack many codes into bytes by itself
+    def write_packed(self, data, n_bits):
+        self.pack()
+        if self.n_bits == 0:
+            # on a byte boundary the whole bytes go straight into the buffer
+            whole = n_bits >> 3
+            self.buffer += data[:whole]
+            left = n_bits & 7
+            if left:
+                self.bits = data[whole] >> (8 - left)
+                self.n_bits = left
+            if len(self.buffer) >= BUFFER_SIZE:
+                self.flush()
+        elif n_bits > 0:
+            self.write_bits(int.from_bytes(data[:(n_bits + 7) >> 3], 'big') >> (-n_bits & 7), n_bits)
+
+    # Moves all whole bytes from the accumulated bits into the buffer
+    # You should not need to call this method
+    def pack(self):
+        n_bytes = self.n_bits >> 3
+        if n_bytes == 0:
+            return
+        left = self.n_bits & 7
+        self.buffer += (self.bits >> left).to_bytes(n_bytes, 'big')
+        self.bits &= (1 << left) - 1
+        self.n_bits = left
+        if len(self.buffer) >= BUFFER_SIZE:
+            self.flush()
+
+    # Writes the buffered bytes to the file
+    # You should not need to call this method
+    def flush(self):
+        if self.buffer:
+            self.file.write(self.buffer)
+            self.bytes_written += len(self.buffer)
+            self.buffer = bytearray()
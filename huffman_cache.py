@@ -0,0 +1,102 @@
+#
+#   LRU cache for built code tables and decoders
+#
+
+import collections
+import sys
+import threading
+
+CACHE_SIZE = 32            # entries kept by the shared cache in huffman.py
+CACHE_BYTES = 64 << 20     # rough bytes kept by the shared cache, a 256 character decoder takes about 6.5 MB
+TABLE_ENTRY_BYTES = 100    # rough bytes taken by one entry of a HuffmanTableDecoder lookup table
+
+
+def value_size(value):
+    '''Returns a rough size in bytes of a cached value. Decoder lookup tables count TABLE_ENTRY_BYTES
+    per entry, NumPy arrays their buffers, tuples and lists what they hold'''
+    if hasattr(value, 'nbytes'):
+        return value.nbytes
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(value_size(item) for item in value)
+    table = getattr(value, 'table', None)
+    if isinstance(table, list):
+        return sys.getsizeof(value) + len(table) * TABLE_ENTRY_BYTES
+    return sys.getsizeof(value)
+
+
+class HuffmanCache:
+    '''Least recently used cache for things that are expensive to rebuild from a header,
+    such as code tables and HuffmanTableDecoder lookup tables. Keys are any hashable digest
+    of a header (the packed code lengths, the frequency list as a tuple, ...).
+    At most maxsize entries are kept, and with maxbytes no more than that many bytes
+    as estimated by value_size. A maxsize of 0 turns caching off. Safe to share between threads'''
+
+    def __init__(self, maxsize=CACHE_SIZE, maxbytes=None):
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.entries = collections.OrderedDict()
+        self.sizes = {}
+        self.nbytes = 0
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, build):
+        '''Returns the value cached for key, calling build() to make it on a miss'''
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+            self.misses += 1
+        value = build()
+        self.put(key, value)
+        return value
+
+    def put(self, key, value):
+        '''Stores value for key, evicting the least recently used entries past maxsize'''
+        with self.lock:
+            if self.maxsize <= 0:
+                return
+            size = value_size(value) if self.maxbytes is not None else 0
+            if self.maxbytes is not None and size > self.maxbytes:
+                return
+            if key in self.entries:
+                self.nbytes -= self.sizes[key]
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            self.sizes[key] = size
+            self.nbytes += size
+            self.evict()
+
+    def resize(self, maxsize):
+        '''Changes the number of entries kept, evicting the oldest ones if it shrinks'''
+        with self.lock:
+            self.maxsize = maxsize
+            self.evict()
+
+    def clear(self):
+        '''Drops every entry and resets the statistics'''
+        with self.lock:
+            self.entries.clear()
+            self.sizes.clear()
+            self.nbytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self):
+        '''Returns a dict with the hit, miss and eviction counts and the current and maximum size,
+        in entries and in estimated bytes'''
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions,
+                    "size": len(self.entries), "maxsize": self.maxsize, "bytes": self.nbytes, "maxbytes": self.maxbytes}
+
+    def evict(self):
+        # caller holds self.lock
+        while self.entries and (len(self.entries) > self.maxsize or
+                                (self.maxbytes is not None and self.nbytes > self.maxbytes)):
+            key, _ = self.entries.popitem(last=False)
+            self.nbytes -= self.sizes.pop(key)
+            self.evictions += 1
@@ -0,0 +1,260 @@
+#
+#   Canonical Huffman codes and the compact code-length header
+#
+#   A canonical compressed file starts with FORMAT_MAGIC and a version byte,
+#   so it can be told apart from the original "char freq" text header, which
+#   always starts with a digit (or is empty). Version 1 then stores:
+#       the number of characters      unsigned LEB128 integer
+#       the code lengths              (run, length) byte pairs covering all 256 characters
+#       the encoded bits              as written by HuffmanBitWriter
+#   Version 2 is the block container of huffman_parallel, which holds many
+#   independent version 1 blocks behind an index
+#   Version 3 is version 1 followed by a sync point index, for random access:
+#       the header and encoded bits   as in version 1, padded to a whole byte
+#       the sync point index          one unsigned LEB128 int per sync point: the bit offset
+#                                     (counted from the first encoded bit) of character number
+#                                     interval * k, for k = 1, 2, ..., as the difference to the
+#                                     offset of the previous sync point
+#       the trailer                   SYNC_TRAILER: file offset of the index, interval
+#   A version 3 file decodes exactly like version 1, the index after the bits is never reached
+#   Version 4 is the single pass stream of huffman_adaptive, whose code table changes as it goes
+#   Version 5 is version 1 with the bits split into the four streams of huffman_streams
+#   Version 6 is the order-1 context model of huffman_context, one code table per group of contexts
+#   Version 7 is the typed blocks of huffman_typed: stored, single character runs or Huffman coded
+#
+
+import struct
+
+FORMAT_MAGIC = b"\xffHF"   # 0xff never starts UTF-8 text, so no text header looks like this
+FORMAT_CANONICAL = 1
+FORMAT_BLOCKS = 2
+FORMAT_INDEXED = 3
+FORMAT_ADAPTIVE = 4
+FORMAT_STREAMS = 5
+FORMAT_CONTEXT = 6
+FORMAT_TYPED = 7
+
+SYNC_INTERVAL = 1 << 16              # characters between sync points by default
+SYNC_TRAILER = struct.Struct(">QQ")  # index offset, interval
+
+
+def code_lengths(freqs, codes):
+    '''Returns the list of code lengths for the codes create_code made from freqs.
+    A one character alphabet has an empty code, that character gets length 1 so it is still marked as used'''
+    lengths = []
+    for char in range(len(freqs)):
+        if freqs[char] == 0:
+            lengths.append(0)
+        else:
+            lengths.append(max(len(codes[char]), 1))
+    return lengths
+
+
+def limited_code_lengths(freqs, max_length):
+    '''Returns the code lengths, none longer than max_length, that give the fewest encoded bits
+    for freqs, found with the package-merge algorithm. Characters with frequency 0 get length 0.
+    Raises ValueError if the used characters do not fit in codes of max_length bits'''
+    used = sorted((freqs[char], char) for char in range(len(freqs)) if freqs[char] > 0)
+    lengths = [0] * len(freqs)
+    if len(used) <= 2:
+        for freq, char in used:
+            lengths[char] = 1
+        return lengths
+    if max_length < 1 or len(used) > 1 << max_length:
+        raise ValueError(str(len(used)) + " characters do not fit in codes of at most " + str(max_length) + " bits")
+
+    # every item is (weight, characters in it); each time a character's leaf is picked
+    # its code gets one bit longer
+    leaves = [(freq, [char]) for freq, char in used]
+    items = leaves
+    for _ in range(max_length - 1):
+        packages = [(items[i][0] + items[i + 1][0], items[i][1] + items[i + 1][1])
+                    for i in range(0, len(items) - 1, 2)]
+        # a stable sort keeps leaves ahead of packages of the same weight
+        items = sorted(leaves + packages, key=lambda item: item[0])
+    for weight, chars in items[:2 * len(used) - 2]:
+        for char in chars:
+            lengths[char] += 1
+    return lengths
+
+
+def encoded_bits(freqs, lengths):
+    '''Returns the number of bits the characters counted in freqs take when coded with lengths'''
+    return sum(freq * length for freq, length in zip(freqs, lengths))
+
+
+def canonical_codes(lengths):
+    '''Returns the canonical code strings for a list of code lengths, indexed by character.
+    Codes are handed out in order of length and then character, so the lengths alone
+    describe the whole code table. Runs in O(alphabet + longest code).
+    Raises ValueError if the lengths break the Kraft inequality, more codes than fit in their bits'''
+    longest = max(lengths, default=0)
+    count = [0] * (longest + 1)
+    for length in lengths:
+        count[length] += 1
+    count[0] = 0
+
+    # first code of every length
+    next_code = [0] * (longest + 1)
+    code = 0
+    for length in range(1, longest + 1):
+        code = (code + count[length - 1]) << 1
+        next_code[length] = code
+
+    codes = [""] * len(lengths)
+    for char in range(len(lengths)):
+        length = lengths[char]
+        if length != 0:
+            if next_code[length] >= 1 << length:
+                raise ValueError("oversubscribed code lengths")
+            codes[char] = format(next_code[length], "0" + str(length) + "b")
+            next_code[length] += 1
+    return codes
+
+
+def pack_lengths(lengths):
+    '''Packs a list of code lengths (each below 256) into (run, length) byte pairs'''
+    packed = bytearray()
+    i = 0
+    while i < len(lengths):
+        run = 1
+        while i + run < len(lengths) and run < 255 and lengths[i + run] == lengths[i]:
+            run += 1
+        packed.append(run)
+        packed.append(lengths[i])
+        i += run
+    return bytes(packed)
+
+
+def pack_uint(value):
+    '''Packs a non-negative int as unsigned LEB128: 7 bits per byte, high bit set on all but the last byte'''
+    packed = bytearray()
+    while value >= 0x80:
+        packed.append((value & 0x7f) | 0x80)
+        value >>= 7
+    packed.append(value)
+    return bytes(packed)
+
+
+def unpack_uint(data, pos):
+    '''Unpacks an unsigned LEB128 int starting at data[pos]. Returns (value, position after it),
+    or (None, pos) if data ends before the int does, for parsers that wait for more data'''
+    reader = ByteReader(data, pos)
+    try:
+        return read_uint(reader), reader.pos
+    except EOFError:
+        return None, pos
+
+
+class ByteReader:
+    '''Reads whole bytes from bytes-like data, starting at pos, or from a binary file object.
+    read_bits reads whole bytes like HuffmanBitReader.read_bits, so read_uint and read_lengths
+    parse headers from either, and raise EOFError the same way when they are cut off'''
+
+    def __init__(self, source, pos=0):
+        self.file = source if hasattr(source, 'read') else None
+        self.data = None if self.file else source
+        self.pos = pos   # bytes-like data only: the offset of the next byte
+
+    def read(self, size):
+        '''Returns the next size bytes'''
+        if self.file is not None:
+            data = self.file.read(size)
+        else:
+            data = bytes(self.data[self.pos:self.pos + size])
+            self.pos += len(data)
+        if len(data) < size:
+            raise EOFError("data ended after " + str(len(data)) + " of " + str(size) + " bytes")
+        return data
+
+    def read_bits(self, n):
+        return int.from_bytes(self.read(n // 8), 'big')
+
+
+def create_canonical_header(numchars, lengths, version=FORMAT_CANONICAL):
+    '''Returns the bytes that start a canonical compressed file'''
+    return FORMAT_MAGIC + bytes([version]) + pack_uint(numchars) + pack_lengths(lengths)
+
+
+def pack_sync_index(offsets, index_offset, interval):
+    '''Returns the sync point index and trailer that end a version 3 file. offsets are the bit
+    offsets of characters interval, 2 * interval, ... and index_offset is where the index starts in the file'''
+    packed = bytearray()
+    previous = 0
+    for offset in offsets:
+        packed += pack_uint(offset - previous)
+        previous = offset
+    return bytes(packed) + SYNC_TRAILER.pack(index_offset, interval)
+
+
+def read_sync_index(f):
+    '''Reads the sync point index of a version 3 file from the seekable binary file object f.
+    Returns (interval, offsets) where offsets[k] is the bit offset of character interval * k, so offsets[0] is 0'''
+    f.seek(0)
+    prefix = f.read(len(FORMAT_MAGIC) + 1)
+    if prefix[:len(FORMAT_MAGIC)] != FORMAT_MAGIC or len(prefix) <= len(FORMAT_MAGIC):
+        raise ValueError("not a canonical Huffman file")
+    if prefix[len(FORMAT_MAGIC)] != FORMAT_INDEXED:
+        raise ValueError("compressed format version " + str(prefix[len(FORMAT_MAGIC)]) + " has no sync point index")
+    end = f.seek(0, 2)
+    if end < SYNC_TRAILER.size:
+        raise ValueError("sync point index trailer is missing")
+    f.seek(end - SYNC_TRAILER.size)
+    index_offset, interval = SYNC_TRAILER.unpack(f.read(SYNC_TRAILER.size))
+    if index_offset > end - SYNC_TRAILER.size or interval == 0:
+        raise ValueError("bad sync point index trailer")
+    f.seek(index_offset)
+    packed = f.read(end - SYNC_TRAILER.size - index_offset)
+
+    offsets = [0]
+    reader = ByteReader(packed)
+    while reader.pos < len(packed):
+        offsets.append(offsets[-1] + read_uint(reader))
+    return interval, offsets
+
+
+def is_canonical(file):
+    '''Returns True if the HuffmanBitReader file is positioned at a canonical header'''
+    return file.peek_bits(8 * len(FORMAT_MAGIC)) == int.from_bytes(FORMAT_MAGIC, 'big')
+
+
+def peek_version(file):
+    '''Returns the format version of the canonical header the HuffmanBitReader file is positioned at'''
+    return file.peek_bits(8 * len(FORMAT_MAGIC) + 8) & 0xff
+
+
+def read_uint(file):
+    '''Reads an unsigned LEB128 int from a HuffmanBitReader or a ByteReader'''
+    value = 0
+    shift = 0
+    while True:
+        byte = file.read_bits(8)
+        value |= (byte & 0x7f) << shift
+        shift += 7
+        if byte < 0x80:
+            return value
+
+
+def read_canonical_header(file, alphabet=256):
+    '''Reads a canonical header (version 1, 3 or 5) from a HuffmanBitReader and returns (number of characters, code lengths)'''
+    if not is_canonical(file):
+        raise ValueError("not a canonical Huffman header")
+    file.consume(8 * len(FORMAT_MAGIC))
+    version = file.read_bits(8)
+    if version not in (FORMAT_CANONICAL, FORMAT_INDEXED, FORMAT_STREAMS):
+        raise ValueError("unsupported compressed format version " + str(version))
+    numchars = read_uint(file)
+    return numchars, read_lengths(file, alphabet)
+
+
+def read_lengths(file, alphabet=256):
+    '''Reads the (run, length) byte pairs written by pack_lengths from a HuffmanBitReader
+    or a ByteReader and returns the list of alphabet lengths'''
+    lengths = []
+    while len(lengths) < alphabet:
+        run = file.read_bits(8)
+        length = file.read_bits(8)
+        if run == 0 or len(lengths) + run > alphabet:
+            raise ValueError("bad code length run in header")
+        lengths.extend([length] * run)
+    return lengths
@@ -0,0 +1,189 @@
+#
+#   Command line tool for compressing and decompressing many files at once
+#
+#       python -m huffman compress logs/ "archive/**/*.log" --workers 8
+#       python -m huffman decompress logs/ --output-dir restored/
+#       python -m huffman decompress big.huf -j 1 --stream-workers 4
+#       python -m huffman bench file_WAP.txt --repeat 1
+#
+#   Directories are searched recursively, glob patterns are expanded (** works).
+#   With --output-dir, files keep their path below the directory or below the part
+#   of the glob pattern before its first wildcard.
+#   Every file is compressed byte for byte with compress_file into <name>.huf, and
+#   files run in parallel on a process pool. An output newer than its input is
+#   left alone unless --force is given, so a nightly run only does new work.
+#   --stream-workers decodes the streams of each multi-stream file on that many
+#   processes, which pays off for a few large files rather than many small ones.
+#
+
+import argparse
+import glob
+import os
+import sys
+import time
+
+from huffman_parallel import *
+
+SUFFIX = ".huf"   # added to the names of compressed files
+
+
+def find_jobs(paths, decompressing, suffix=SUFFIX, output_dir=None):
+    '''Returns (input, output) pairs for the files, directories and glob patterns in paths.
+    Compressing takes every file not already ending in suffix and adds suffix to the output;
+    decompressing takes the files ending in suffix and strips it. When output_dir is given, files
+    found in a directory keep their place below it, glob matches their place below the pattern's
+    directory before the first wildcard, and other files go straight into output_dir.
+    Raises ValueError if two inputs would be written to the same output'''
+    jobs = []
+    seen = set()
+    targets = {}
+    for path in paths:
+        if os.path.isdir(path):
+            found = []
+            for root, dirs, files in os.walk(path):
+                dirs.sort()
+                found += [(os.path.join(root, name), path) for name in sorted(files)]
+        else:
+            if glob.has_magic(path):
+                found = [(name, glob_base(path)) for name in sorted(glob.glob(path, recursive=True))
+                         if os.path.isfile(name)]
+            else:
+                found = [(path, os.path.dirname(path) or os.curdir)] if os.path.isfile(path) else []
+            if not found:
+                raise FileNotFoundError("no files match " + path)
+        for name, base in found:
+            if name.endswith(suffix) != decompressing or name in seen:
+                continue
+            seen.add(name)
+            target = name[:-len(suffix)] if decompressing else name + suffix
+            if output_dir is not None:
+                target = os.path.join(output_dir, os.path.relpath(target, base))
+            key = os.path.normpath(target)
+            if key in targets:
+                raise ValueError("both " + targets[key] + " and " + name + " would be written to " + target)
+            targets[key] = name
+            jobs.append((name, target))
+    return jobs
+
+
+def glob_base(pattern):
+    '''Returns the directory part of a glob pattern before its first wildcard'''
+    base = pattern
+    while glob.has_magic(base):
+        base = os.path.dirname(base)
+    return base or os.curdir
+
+
+def is_up_to_date(source, target):
+    '''Returns True if target exists and was written after source last changed'''
+    try:
+        return os.path.getmtime(target) >= os.path.getmtime(source)
+    except OSError:
+        return False
+
+
+def run_job(job):
+    '''Compresses or decompresses one file, job is (decompressing, input, output, stream workers).
+    The output is written under a temporary name and renamed when complete, so an
+    interrupted run never leaves a partial file that looks up to date.
+    Returns (input, bytes read, bytes written, error message or None)'''
+    decompressing, source, target, stream_workers = job
+    partial = target + ".part"
+    try:
+        directory = os.path.dirname(target)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(source, 'rb') as in_f, open(partial, 'wb') as out_f:
+            if decompressing:
+                decompress_file(in_f, out_f, stream_workers)
+            else:
+                compress_file(in_f, out_f)
+        os.replace(partial, target)
+        return source, os.path.getsize(source), os.path.getsize(target), None
+    except Exception as e:
+        # any failure, even an unexpected one, fails this file only and leaves no partial output
+        if os.path.exists(partial):
+            os.remove(partial)
+        return source, 0, 0, str(e) or type(e).__name__
+
+
+def process(paths, decompressing=False, workers=None, force=False, suffix=SUFFIX, output_dir=None, out=None,
+            verbose=False, stream_workers=1):
+    '''Compresses (or decompresses) every file found in paths on workers processes and writes
+    a summary to out. Decompressing, the streams of multi-stream files are decoded on
+    stream_workers processes (see read_decoder). Returns a dict with the files done, skipped and failed, the bytes read
+    and written, the seconds taken, the throughput in MB/s and the compression ratio'''
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if out is None:
+        out = sys.stdout
+    start = time.perf_counter()
+    jobs = []
+    skipped = 0
+    for source, target in find_jobs(paths, decompressing, suffix, output_dir):
+        if not force and is_up_to_date(source, target):
+            skipped += 1
+        else:
+            jobs.append((decompressing, source, target, stream_workers))
+
+    done = failed = bytes_in = bytes_out = 0
+    for source, read, written, error in run_in_pool(run_job, jobs, workers):
+        if error is not None:
+            failed += 1
+            print("error: " + source + ": " + error, file=out)
+            continue
+        done += 1
+        bytes_in += read
+        bytes_out += written
+        if verbose:
+            print("%s  %d -> %d bytes" % (source, read, written), file=out)
+
+    seconds = time.perf_counter() - start
+    original, compressed = (bytes_out, bytes_in) if decompressing else (bytes_in, bytes_out)
+    summary = {
+        "files": done, "skipped": skipped, "failed": failed,
+        "bytes_in": bytes_in, "bytes_out": bytes_out, "seconds": seconds,
+        "mb_per_s": bytes_in / seconds / 1e6 if seconds > 0 else None,
+        "ratio": compressed / original if original else None,
+    }
+    print("%d files %s, %d up to date, %d failed: %d -> %d bytes in %.2fs (%.1f MB/s, ratio %s)" % (
+        done, "decompressed" if decompressing else "compressed", skipped, failed, bytes_in, bytes_out, seconds,
+        summary["mb_per_s"] or 0.0, "%.3f" % summary["ratio"] if summary["ratio"] is not None else "n/a"), file=out)
+    return summary
+
+
+def main(argv=None):
+    '''Entry point of python -m huffman, returns the exit status'''
+    parser = argparse.ArgumentParser(prog="python -m huffman", description="Huffman compress or decompress files")
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ["compress", "decompress"]:
+        command = commands.add_parser(name, help=name + " files, directories and glob patterns")
+        command.add_argument("paths", nargs="+", help="files, directories (searched recursively) or glob patterns")
+        command.add_argument("-o", "--output-dir", help="write the outputs here instead of next to the inputs")
+        command.add_argument("-j", "--workers", type=int, default=None, help="processes to use (default: all cores)")
+        command.add_argument("-f", "--force", action="store_true", help="redo files whose output is up to date")
+        command.add_argument("--suffix", default=SUFFIX, help="suffix of compressed files (default: %(default)s)")
+        command.add_argument("-v", "--verbose", action="store_true", help="print a line for every file")
+        if name == "decompress":
+            command.add_argument("--stream-workers", type=int, default=1,
+                                 help="processes decoding the streams of each multi-stream file (default: 1)")
+    commands.add_parser("bench", help="run huffman_bench, the remaining arguments are passed on", add_help=False)
+
+    args, rest = parser.parse_known_args(argv)
+    if args.command == "bench":
+        import huffman_bench
+        huffman_bench.main(rest)
+        return 0
+    if rest:
+        parser.error("unrecognized arguments: " + " ".join(rest))
+    try:
+        summary = process(args.paths, args.command == "decompress", args.workers, args.force, args.suffix,
+                          args.output_dir, verbose=args.verbose, stream_workers=getattr(args, "stream_workers", 1))
+    except (FileNotFoundError, ValueError) as e:
+        print("error: " + str(e), file=sys.stderr)
+        return 2
+    return 1 if summary["failed"] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
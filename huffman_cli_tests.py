@@ -0,0 +1,117 @@
+import unittest
+import contextlib
+import io
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+from huffman_cli import *
+
+
+class TestCli(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.logs = os.path.join(self.tmp.name, "logs")
+        os.makedirs(os.path.join(self.logs, "old"))
+        for name in ["file1.txt", "declaration.txt", "multiline.txt"]:
+            shutil.copy(name, self.logs)
+        shutil.copy("file2.txt", os.path.join(self.logs, "old"))
+        with open(os.path.join(self.logs, "old", "binary.log"), 'wb') as f:
+            f.write(bytes(range(256)) * 10 + b"\r\n\r")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_compress_decompress(self):
+        out = io.StringIO()
+        summary = process([self.logs], workers=2, out=out)
+        self.assertEqual((summary["files"], summary["skipped"], summary["failed"]), (5, 0, 0))
+        self.assertLess(summary["ratio"], 1)
+        self.assertIn("5 files compressed", out.getvalue())
+        self.assertTrue(os.path.exists(os.path.join(self.logs, "old", "binary.log.huf")))
+
+        # nothing changed, so nothing is redone unless forced
+        summary = process([self.logs], workers=1, out=io.StringIO())
+        self.assertEqual((summary["files"], summary["skipped"]), (0, 5))
+        summary = process([os.path.join(self.logs, "*.txt")], workers=1, force=True, out=io.StringIO())
+        self.assertEqual(summary["files"], 3)
+
+        restored = os.path.join(self.tmp.name, "restored")
+        summary = process([self.logs], decompressing=True, workers=2, output_dir=restored, out=io.StringIO())
+        self.assertEqual(summary["files"], 5)
+        for name in ["file1.txt", "declaration.txt", "old/binary.log"]:
+            with open(os.path.join(self.logs, name), 'rb') as f, open(os.path.join(restored, name), 'rb') as g:
+                self.assertEqual(f.read(), g.read())
+
+    def test_stream_workers(self):
+        with open("declaration.txt", 'rb') as f:
+            text = f.read()
+        streams = os.path.join(self.tmp.name, "streams")
+        os.makedirs(streams)
+        with open(os.path.join(streams, "declaration.txt.huf"), 'wb') as f:
+            f.write(compress(text, streams=STREAM_COUNT))
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            self.assertEqual(main(["decompress", streams, "-j", "1", "--stream-workers", "2"]), 0)
+        self.assertIn("1 files decompressed", out.getvalue())
+        with open(os.path.join(streams, "declaration.txt"), 'rb') as f:
+            self.assertEqual(f.read(), text)
+
+    def test_find_jobs(self):
+        jobs = find_jobs([os.path.join(self.logs, "**", "*.txt")], False, output_dir="out")
+        self.assertEqual(len(jobs), 4)
+        self.assertIn((os.path.join(self.logs, "old", "file2.txt"), os.path.join("out", "old", "file2.txt.huf")), jobs)
+        self.assertIn((os.path.join(self.logs, "file1.txt"), os.path.join("out", "file1.txt.huf")), jobs)
+        with self.assertRaises(FileNotFoundError):
+            find_jobs([os.path.join(self.logs, "*.nothing")], False)
+
+        # the same name in two directories matched by a wildcard keeps the directories apart
+        shutil.copy("file1.txt", os.path.join(self.logs, "old"))
+        jobs = find_jobs([os.path.join(self.logs, "*", "file1.txt"), os.path.join(self.logs, "file1.txt")], False,
+                         output_dir="out")
+        self.assertEqual(sorted(target for name, target in jobs),
+                         [os.path.join("out", "file1.txt.huf"), os.path.join("out", "old", "file1.txt.huf")])
+        # files named one by one have nothing to keep them apart, which is an error, not an overwrite
+        with self.assertRaises(ValueError):
+            find_jobs([os.path.join(self.logs, "file1.txt"), os.path.join(self.logs, "old", "file1.txt")], False,
+                      output_dir="out")
+
+    def test_errors(self):
+        with open(os.path.join(self.logs, "broken.huf"), 'wb') as f:
+            f.write(b"\xffHF\x07")
+        out = io.StringIO()
+        summary = process([self.logs], decompressing=True, workers=1, out=out)
+        self.assertEqual(summary["failed"], 1)
+        self.assertIn("error: ", out.getvalue())
+        self.assertFalse(os.path.exists(os.path.join(self.logs, "broken")))
+        self.assertFalse(os.path.exists(os.path.join(self.logs, "broken.part")))
+
+        # a garbage text header fails that file alone, the files after it are still done
+        with open(os.path.join(self.logs, "bad.huf"), 'wb') as f:
+            f.write(b"12\n\x00")
+        with open(os.path.join(self.logs, "worse.huf"), 'wb') as f:
+            f.write(b"300 1\n\x00")
+        restored = os.path.join(self.tmp.name, "restored")
+        process([self.logs], workers=1, out=io.StringIO())
+        out = io.StringIO()
+        summary = process([self.logs], decompressing=True, workers=1, output_dir=restored, out=out)
+        self.assertEqual((summary["files"], summary["failed"]), (5, 3))
+        self.assertIn("bad.huf", out.getvalue())
+        self.assertIn("3 failed", out.getvalue())
+        self.assertEqual(sorted(name for name in os.listdir(restored) if name.endswith(".part")), [])
+        self.assertFalse(os.path.exists(os.path.join(restored, "bad")))
+
+    def test_module_entry_point(self):
+        result = subprocess.run([sys.executable, "-m", "huffman", "compress", self.logs, "-j", "1"],
+                                capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertIn("5 files compressed", result.stdout)
+        result = subprocess.run([sys.executable, "-m", "huffman", "compress", "no/such/*.txt"],
+                                capture_output=True, text=True)
+        self.assertEqual(result.returncode, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,181 @@
+#
+#   Order-1 context modelling: a code table per previous byte
+#
+#   In text the byte before a character says a lot about it ("q" is nearly always
+#   followed by "u"), so coding each byte with a table built only from the bytes that
+#   followed the same previous byte takes fewer bits than one table for the whole file.
+#   Every table costs header space, so only contexts that save more than their table
+#   costs get one of their own, at most max_tables - 1 of them; all the rare contexts
+#   are clustered into one shared table. The first byte is coded in context 0.
+#   File layout (format version 6, FORMAT_CONTEXT):
+#       FORMAT_MAGIC, version byte FORMAT_CONTEXT
+#       the number of characters      unsigned LEB128 integer
+#       the number of tables          unsigned LEB128 integer
+#       the context map               the table of every previous byte, as (run, table) byte pairs
+#       the code lengths              (run, length) byte pairs covering all 256 characters, per table
+#       the encoded bits              as written by HuffmanBitWriter
+#
+
+import collections
+import io
+
+from huffman import *
+
+CONTEXT_TABLES = 32         # most code tables in a file, the last one shared by the rare contexts
+CONTEXT_MIN_COUNT = 64      # characters a context needs before it may get a table of its own
+
+context_decoders = HuffmanCache(4, CACHE_BYTES)   # kept apart from code_cache, one decoder holds many tables
+
+
+def add_pairs(counts, block, prev=0):
+    '''Adds the number of times every (previous byte, byte) pair occurs in the bytes-like block
+    to counts, a list indexed by 256 * previous + byte. prev is the byte before the block'''
+    if not len(block):
+        return
+    if numpy is not None:
+        data = numpy.frombuffer(block, dtype=numpy.uint8).astype(numpy.intp)
+        keys = numpy.concatenate(([prev << 8], data[:-1] << 8)) | data
+        found = numpy.bincount(keys, minlength=1 << 16)
+        for key in numpy.flatnonzero(found).tolist():
+            counts[key] += int(found[key])
+        return
+    before = bytes([prev]) + bytes(block[:-1])
+    for key, n in collections.Counter([p << 8 | c for p, c in zip(before, block)]).items():
+        counts[key] += n
+
+
+def context_tables(pairs, max_tables=CONTEXT_TABLES):
+    '''Returns (context map, list of code lengths per table) for the pair counts from add_pairs.
+    The context map gives the table of every previous byte. Contexts are offered a table of their
+    own from the most frequent down; one is kept when its coded size plus its header is smaller
+    than coding the context with the table for the whole file'''
+    freqs = [pairs[prev << 8:(prev + 1) << 8] for prev in range(256)]
+    totals = [sum(freq) for freq in freqs]
+    if not any(totals):
+        return [0]*256, []
+    whole = canonical_table([sum(column) for column in zip(*freqs)])[0]
+
+    own = {}
+    for prev in sorted(range(256), key=lambda prev: -totals[prev]):
+        if len(own) >= max_tables - 1 or totals[prev] < CONTEXT_MIN_COUNT:
+            break
+        lengths = canonical_table(freqs[prev])[0]
+        if encoded_bits(freqs[prev], lengths) + 8 * len(pack_lengths(lengths)) < encoded_bits(freqs[prev], whole):
+            own[prev] = lengths
+
+    context_map = [0]*256
+    tables = []
+    shared = [0]*256
+    for prev in range(256):
+        if prev not in own and totals[prev]:
+            shared = [a + b for a, b in zip(shared, freqs[prev])]
+    if any(shared):
+        tables.append(canonical_table(shared)[0])
+    for prev, lengths in own.items():
+        context_map[prev] = len(tables)
+        tables.append(lengths)
+    return context_map, tables
+
+
+def create_context_header(numchars, context_map, tables):
+    '''Returns the format version 6 header'''
+    return (FORMAT_MAGIC + bytes([FORMAT_CONTEXT]) + pack_uint(numchars) + pack_uint(len(tables)) +
+            pack_lengths(context_map) + b"".join(pack_lengths(lengths) for lengths in tables))
+
+
+def read_context_header(file):
+    '''Reads a format version 6 header from a HuffmanBitReader and returns
+    (number of characters, context map, list of code lengths per table)'''
+    if not is_canonical(file) or peek_version(file) != FORMAT_CONTEXT:
+        raise ValueError("not a context modelled Huffman header")
+    file.consume(8 * len(FORMAT_MAGIC) + 8)
+    numchars = read_uint(file)
+    count = read_uint(file)
+    context_map = read_lengths(file)
+    if count and max(context_map) >= count:
+        raise ValueError("context map refers to a missing code table")
+    tables = [read_lengths(file) for _ in range(count)]
+    return numchars, context_map, tables
+
+
+class ContextDecoder(HuffmanTableDecoder):
+    '''Decodes the bits of a context modelled file a byte at a time. The states of the single
+    table decoder become (table, internal node) pairs: a completed character moves the walk
+    to the root of the table of its context, so one lookup table covers every table'''
+
+    def __init__(self, context_map, tables):
+        self.tree = None
+        self.single = None
+        self.step = None
+        self.table = None
+        if not tables:
+            return
+        first = context_map[0]
+        order = [first] + [table for table in range(len(tables)) if table != first]
+        local = {table: self.steps_from_codes(canonical_codes(tables[table])) for table in order}
+        root = {}            # the state of the root of every table
+        states = 0
+        for table in order:
+            root[table] = states
+            states += len(local[table])
+        self.step = []
+        for table in order:
+            for pair in local[table]:
+                self.step.append([(out, root[context_map[out[0]]]) if out else (out, root[table] + state)
+                                  for out, state in pair])
+        self.table = self.build_table(self.step)
+
+
+def context_decoder(context_map, tables):
+    '''Returns the ContextDecoder for a header, from context_decoders when it was built before'''
+    key = ("context", bytes(context_map), tuple(bytes(lengths) for lengths in tables))
+    return context_decoders.get(key, lambda: ContextDecoder(context_map, tables))
+
+
+def compress_context_file(in_f, out_f, max_tables=CONTEXT_TABLES):
+    '''Compresses the binary file object in_f into the binary file object out_f with an order-1
+    context model of at most max_tables code tables. in_f is read twice, so it must be seekable'''
+    start = in_f.tell()
+    pairs = [0]*(1 << 16)
+    prev = 0
+    numchars = 0
+    for block in iter(lambda: in_f.read(FREQ_BLOCK_SIZE), b""):
+        add_pairs(pairs, block, prev)
+        prev = block[-1]
+        numchars += len(block)
+    context_map, tables = context_tables(pairs, max_tables)
+
+    codes = [canonical_codes(lengths) for lengths in tables]
+    pair_codes = [codes[context_map[prev]][char] if tables else "" for prev in range(256) for char in range(256)]
+    a = HuffmanBitWriter(out_f)
+    a.write_bytes(create_context_header(numchars, context_map, tables))
+    in_f.seek(start)
+    prev = 0
+    for chunk in iter(lambda: in_f.read(CHUNK_SIZE), b""):
+        before = bytes([prev]) + chunk[:-1]
+        a.write_code("".join([pair_codes[p << 8 | c] for p, c in zip(before, chunk)]))
+        prev = chunk[-1]
+    a.close()
+
+
+def decompress_context_file(in_f, out_f):
+    '''Decompresses a file written by compress_context_file from the binary file object in_f into out_f'''
+    file = HuffmanBitReader(in_f)
+    numchars, context_map, tables = read_context_header(file)
+    for piece in context_decoder(context_map, tables).decode_blocks(file.mapped_blocks(), numchars):
+        out_f.write(piece)
+    file.close()
+
+
+def compress_context(data, max_tables=CONTEXT_TABLES):
+    '''Compresses bytes-like data with an order-1 context model and returns the compressed bytes'''
+    out = io.BytesIO()
+    compress_context_file(io.BytesIO(data), out, max_tables)
+    return out.getvalue()
+
+
+def decompress_context(blob):
+    '''Returns the original bytes of a blob made by compress_context'''
+    out = io.BytesIO()
+    decompress_context_file(io.BytesIO(blob), out)
+    return out.getvalue()
@@ -0,0 +1,46 @@
+import unittest
+import random
+from huffman_context import *
+
+
+class TestContext(unittest.TestCase):
+
+    def test_round_trip(self):
+        rng = random.Random(3)
+        inputs = [b"", b"a", b"aaaaaaaa", b"ab" * 500, bytes(rng.randrange(256) for _ in range(20000))]
+        for name in ["file1.txt", "declaration.txt", "multiline.txt", "filecharacter.txt"]:
+            with open(name, 'rb') as f:
+                inputs.append(f.read())
+        for data in inputs:
+            for max_tables in [1, 2, CONTEXT_TABLES]:
+                blob = compress_context(data, max_tables)
+                self.assertTrue(blob.startswith(FORMAT_MAGIC + bytes([FORMAT_CONTEXT])))
+                self.assertEqual(decompress_context(blob), data)
+
+    def test_smaller_on_text(self):
+        with open("file_WAP.txt", 'rb') as f:
+            data = f.read()
+        blob = compress_context(data)
+        self.assertEqual(decompress_context(blob), data)
+        self.assertLess(len(blob), len(compress(data)) * 0.85)
+
+        pairs = [0]*(1 << 16)
+        add_pairs(pairs, data)
+        self.assertEqual(sum(pairs), len(data))
+        self.assertEqual(pairs[ord("q") << 8 | ord("u")], data.count(b"qu"))
+        context_map, tables = context_tables(pairs)
+        self.assertLessEqual(len(tables), CONTEXT_TABLES)
+        # a context with a table of its own has its table's codes for what follows it
+        self.assertNotEqual(context_map[ord("q")], context_map[ord(" ")])
+
+    def test_bad_header(self):
+        with self.assertRaises(ValueError):
+            decompress_context(compress(b"some text"))
+        blob = bytearray(compress_context(b"abracadabra"))
+        blob[5] = 0   # no code tables for 11 characters
+        with self.assertRaises(ValueError):
+            decompress_context(bytes(blob))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,48 +1,128 @@
-import unittest
-import filecmp
-from huffman import *
-import subprocess
-
-class TestList(unittest.TestCase):
-    def test_01a_test_file1_parse_header(self):
-        f = HuffmanBitReader('file1_compressed_soln.txt')
-        header = f.read_str()        
-        f.close()
-        expected = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 3, 0, 0, 0, \
-                    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, \
-                    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 4, 3, 2, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, \
-                    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, \
-                    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, \
-                    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, \
-                    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
-        self.compare_freq_counts(parse_header(header), expected)
-        
-    def test_01_test_file1_decode(self):
-        huffman_decode("file1_compressed_soln.txt", "file1_decoded.txt")
-        err = subprocess.call("diff -wb file1.txt file1_decoded.txt", shell = True)
-        self.assertEqual(err, 0)
-
-        huffman_decode("file2_compressed_soln.txt", "file2_decoded.txt")
-        err = subprocess.call("diff -wb file2.txt file2_decoded.txt", shell=True)
-        self.assertEqual(err, 0)
-
-        huffman_decode("declaration_compressed_soln.txt", "declaration_decoded.txt")
-        err = subprocess.call("diff -wb declaration.txt declaration_decoded.txt", shell=True)
-        self.assertEqual(err, 0)
-
-        huffman_decode("multiline_compressed_soln.txt", "multiline_decoded.txt")
-        err = subprocess.call("diff -wb multiline.txt multiline_decoded.txt", shell=True)
-        self.assertEqual(err, 0)
-
-        # huffman_decode("file_WAP_compressed_soln.txt", "file_WAP_decoded.txt")
-        # err = subprocess.call("diff -wb file_WAP.txt file_WAP_decoded.txt", shell=True)
-        # self.assertEqual(err, 0)
-
-    def compare_freq_counts(self, freq, exp):
-        for i in range(256):
-            stu = 'Frequency for ASCII ' + str(i) + ': ' + str(freq[i])
-            ins = 'Frequency for ASCII ' + str(i) + ': ' + str(exp[i])
-            self.assertEqual(stu, ins)
-                
-if __name__ == '__main__': 
-   unittest.main()
+import unittest
+import filecmp
+from huffman import *
+import subprocess
+
+class TestList(unittest.TestCase):
+    def test_01a_test_file1_parse_header(self):
+        f = HuffmanBitReader('file1_compressed_soln.txt')
+        header = f.read_str()        
+        f.close()
+        expected = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 3, 0, 0, 0, \
+                    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, \
+                    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 4, 3, 2, 1, 0, 0, 0, 0, 0, 0, 0, 0, 0, \
+                    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, \
+                    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, \
+                    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, \
+                    0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0]
+        self.compare_freq_counts(parse_header(header), expected)
+        
+    def test_01_test_file1_decode(self):
+        huffman_decode("file1_compressed_soln.txt", "file1_decoded.txt")
+        err = subprocess.call("diff -wb file1.txt file1_decoded.txt", shell = True)
+        self.assertEqual(err, 0)
+
+        huffman_decode("file2_compressed_soln.txt", "file2_decoded.txt")
+        err = subprocess.call("diff -wb file2.txt file2_decoded.txt", shell=True)
+        self.assertEqual(err, 0)
+
+        huffman_decode("declaration_compressed_soln.txt", "declaration_decoded.txt")
+        err = subprocess.call("diff -wb declaration.txt declaration_decoded.txt", shell=True)
+        self.assertEqual(err, 0)
+
+        huffman_decode("multiline_compressed_soln.txt", "multiline_decoded.txt")
+        err = subprocess.call("diff -wb multiline.txt multiline_decoded.txt", shell=True)
+        self.assertEqual(err, 0)
+
+        huffman_decode("file_WAP_compressed_soln.txt", "file_WAP_decoded.txt")
+        err = subprocess.call("diff -wb file_WAP.txt file_WAP_decoded.txt", shell=True)
+        self.assertEqual(err, 0)
+
+    def test_02_table_decoder_matches_tree_walk(self):
+        f = HuffmanBitReader('declaration_compressed_soln.txt')
+        listfreq = parse_header(f.read_str())
+        tree = create_huff_tree(listfreq)
+        numchars = num_characters(listfreq)
+        walked = []
+        while len(walked) < numchars:
+            node = tree
+            while node.left is not None and node.right is not None:
+                node = node.right if f.read_bit() else node.left
+            walked.append(node.char)
+        f.close()
+
+        f = HuffmanBitReader('declaration_compressed_soln.txt')
+        f.read_str()
+        decoded = HuffmanTableDecoder(tree).decode(f.read_bytes(), numchars)
+        f.close()
+        self.assertEqual(decoded, bytes(walked))
+
+        self.assertEqual(HuffmanTableDecoder(HuffmanNode(97, 3)).decode(b"", 3), b"aaa")
+        self.assertEqual(HuffmanTableDecoder(None).decode(b"", 0), b"")
+        with self.assertRaises(ValueError):
+            HuffmanTableDecoder(tree).decode(b"\x00", numchars)
+
+    def test_03_bit_reader_bits(self):
+        with open('declaration_compressed_soln.txt', 'rb') as f:
+            header = f.readline()
+            payload = f.read()
+        as_int = int.from_bytes(payload, 'big')
+        total = len(payload) * 8
+
+        f = HuffmanBitReader('declaration_compressed_soln.txt')
+        self.assertEqual(f.read_str(), header.decode('utf-8'))
+        pos = 0
+        for n in [1, 3, 12, 7, 30, 64, 5, 100]:
+            expected = (as_int >> (total - pos - n)) & ((1 << n) - 1)
+            self.assertEqual(f.peek_bits(n), expected)
+            self.assertEqual(f.read_bits(n), expected)
+            pos += n
+        f.consume(10)
+        pos += 10
+        self.assertEqual(f.read_bit(), bool((as_int >> (total - pos - 1)) & 1))
+        pos += 1
+        self.assertEqual(f.read_bytes(), payload[(pos + 7) // 8:])
+        f.consume(-pos % 8)
+        self.assertEqual(f.peek_bits(4), 0)
+        with self.assertRaises(EOFError):
+            f.consume(8)
+        f.close()
+
+    def test_04_mapped_decode(self):
+        with open('declaration.txt') as f:
+            text = f.read()
+        with open('declaration_compressed_soln.txt', 'rb') as f:
+            header = f.readline()
+            payload = f.read()
+
+        f = HuffmanBitReader('declaration_compressed_soln.txt')
+        f.read_str()
+        self.assertEqual(b"".join(bytes(block) for block in f.mapped_blocks()), payload)
+        self.assertEqual(f.bytes_read, len(header) + len(payload))
+        f.close()
+
+        out = huffman_decode_buffer('declaration_compressed_soln.txt')
+        self.assertIsInstance(out, bytearray)
+        self.assertEqual(out.decode('latin-1'), text)
+
+        # a caller supplied buffer, and a file object that cannot be mapped
+        buffer = bytearray(len(text) + 5)
+        with open('declaration_compressed_soln.txt', 'rb') as f:
+            blob = f.read()
+        self.assertIs(huffman_decode_buffer(io.BytesIO(blob), buffer), buffer)
+        self.assertEqual(buffer[:len(text)].decode('latin-1'), text)
+        with profile() as stats:
+            with self.assertRaises(ValueError):
+                huffman_decode_buffer(io.BytesIO(blob), bytearray(10))
+        # a failed call is still reported
+        self.assertEqual(stats.snapshot()["decompress"]["calls"], 1)
+        self.assertEqual(huffman_decode_buffer('empty_file_out.txt'), bytearray())
+
+    def compare_freq_counts(self, freq, exp):
+        for i in range(256):
+            stu = 'Frequency for ASCII ' + str(i) + ': ' + str(freq[i])
+            ins = 'Frequency for ASCII ' + str(i) + ': ' + str(exp[i])
+            self.assertEqual(stu, ins)
+                
+if __name__ == '__main__': 
+   unittest.main()
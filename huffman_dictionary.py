@@ -0,0 +1,128 @@
+#
+#   Pretrained code tables (dictionaries) for small messages
+#
+#   A message of a few hundred bytes is often smaller than its own code table, and
+#   building the table costs more than coding the message. A dictionary is a code
+#   table trained once on sample data and shared by both ends; each message then
+#   only names the dictionary it was coded with.
+#   Dictionary file layout:
+#       DICTIONARY_MAGIC, version byte DICTIONARY_VERSION
+#       the dictionary ID             unsigned LEB128 integer
+#       the code lengths              (run, length) byte pairs covering all 256 characters
+#   Message layout (no magic, no table):
+#       the dictionary ID             unsigned LEB128 integer
+#       the number of characters      unsigned LEB128 integer
+#       the encoded bits              padded to a whole byte
+#
+
+import io
+import threading
+
+from huffman import *
+
+DICTIONARY_MAGIC = b"\xffHD"
+DICTIONARY_VERSION = 1
+DICTIONARY_MAX_LENGTH = 16   # longest code a dictionary may use, for bytes rare in the samples
+
+dictionaries = {}                  # dictionary ID -> HuffmanDictionary, for every dictionary loaded or registered
+dictionaries_lock = threading.Lock()
+
+
+class HuffmanDictionary:
+    '''A code table for every byte with an ID, plus its encode and decode tables, which are
+    built once when the dictionary is made and shared by every message coded with it'''
+
+    def __init__(self, dict_id, lengths):
+        if dict_id < 0:
+            raise ValueError("dictionary ID must not be negative")
+        if len(lengths) != 256 or not all(lengths):
+            raise ValueError("a dictionary needs a code for each of the 256 byte values")
+        self.dict_id = dict_id
+        self.lengths = list(lengths)
+        self.codes = canonical_codes(self.lengths)
+        self.table = code_table(self.codes, None)   # held by the dictionary, not by code_cache
+        self.decoder = HuffmanTableDecoder(None, self.codes)
+
+    def to_bytes(self):
+        '''Returns the contents of the dictionary file'''
+        return DICTIONARY_MAGIC + bytes([DICTIONARY_VERSION]) + pack_uint(self.dict_id) + pack_lengths(self.lengths)
+
+    @classmethod
+    def from_bytes(cls, data):
+        '''Returns the dictionary stored in the contents of a dictionary file'''
+        if data[:len(DICTIONARY_MAGIC)] != DICTIONARY_MAGIC or len(data) <= len(DICTIONARY_MAGIC):
+            raise ValueError("not a Huffman dictionary")
+        if data[len(DICTIONARY_MAGIC)] != DICTIONARY_VERSION:
+            raise ValueError("unsupported dictionary version " + str(data[len(DICTIONARY_MAGIC)]))
+        reader = ByteReader(data, len(DICTIONARY_MAGIC) + 1)
+        dict_id = read_uint(reader)
+        return cls(dict_id, read_lengths(reader))
+
+
+def train_dictionary(samples, dict_id, max_length=DICTIONARY_MAX_LENGTH):
+    '''Returns a HuffmanDictionary with ID dict_id for messages like the bytes-like samples.
+    Every byte value is counted once more than it occurs, so bytes missing from the
+    samples still get a code, and codes are kept to max_length bits'''
+    freqs = [1]*256
+    for sample in samples:
+        freqs = [a + b for a, b in zip(freqs, count_bytes(sample))]
+    return HuffmanDictionary(dict_id, canonical_table(freqs, max_length)[0])
+
+
+def register_dictionary(dictionary):
+    '''Makes dictionary the one used for messages with its ID and returns it'''
+    with dictionaries_lock:
+        dictionaries[dictionary.dict_id] = dictionary
+    return dictionary
+
+
+def get_dictionary(dict_id):
+    '''Returns the registered dictionary with ID dict_id'''
+    with dictionaries_lock:
+        if dict_id not in dictionaries:
+            raise ValueError("unknown dictionary ID " + str(dict_id))
+        return dictionaries[dict_id]
+
+
+def save_dictionary(dictionary, filename):
+    '''Writes dictionary to the file filename'''
+    with open(filename, 'wb') as f:
+        f.write(dictionary.to_bytes())
+
+
+def load_dictionary(filename):
+    '''Reads the dictionary file filename, registers the dictionary and returns it.
+    A dictionary already registered under the same ID with the same codes is returned as it is,
+    so loading a file again does not build its tables again'''
+    with open(filename, 'rb') as f:
+        data = f.read()
+    with dictionaries_lock:
+        for known in dictionaries.values():
+            if known.to_bytes() == data:
+                return known
+    return register_dictionary(HuffmanDictionary.from_bytes(data))
+
+
+def compress_with_dictionary(data, dictionary=None, dict_id=None):
+    '''Compresses bytes-like data with a dictionary, given itself or by the ID it was registered
+    under, and returns the message: the ID, the length and the codes, without a code table'''
+    if dictionary is None:
+        dictionary = get_dictionary(dict_id)
+    a = HuffmanBitWriter(io.BytesIO())
+    a.write_bytes(pack_uint(dictionary.dict_id) + pack_uint(len(data)))
+    write_chunk(a, data, dictionary.codes, dictionary.table)
+    a.close()
+    return a.file.getvalue()
+
+
+def decompress_with_dictionary(message, dictionary=None):
+    '''Returns the original bytes of a message from compress_with_dictionary. The dictionary
+    named by the message is looked up among the registered ones unless it is given'''
+    reader = ByteReader(message)
+    dict_id = read_uint(reader)
+    numchars = read_uint(reader)
+    if dictionary is None:
+        dictionary = get_dictionary(dict_id)
+    elif dictionary.dict_id != dict_id:
+        raise ValueError("message was coded with dictionary " + str(dict_id) + ", not " + str(dictionary.dict_id))
+    return dictionary.decoder.decode(memoryview(message)[reader.pos:], numchars)
@@ -0,0 +1,56 @@
+import unittest
+import os
+import tempfile
+from huffman_dictionary import *
+
+
+class TestDictionary(unittest.TestCase):
+
+    def test_round_trip(self):
+        with open("file_WAP.txt", 'rb') as f:
+            samples = [f.read(100000)]
+        dictionary = train_dictionary(samples, 7)
+        self.assertLessEqual(max(dictionary.lengths), DICTIONARY_MAX_LENGTH)
+        with open("declaration.txt", 'rb') as f:
+            text = f.read()
+        for message in [b"", b"a", text[:300], bytes(range(256)), text]:
+            blob = compress_with_dictionary(message, dictionary)
+            self.assertEqual(blob[0], 7)
+            self.assertEqual(decompress_with_dictionary(blob, dictionary), message)
+        # no code table is stored, so a short message beats compress by a wide margin
+        self.assertLess(len(compress_with_dictionary(text[:300], dictionary)) + 50, len(compress(text[:300])))
+        self.assertLess(len(compress_with_dictionary(text[:300], dictionary)), 250)
+
+    def test_files_and_ids(self):
+        dictionary = train_dictionary([b"hello world"], 300)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "hello.hdict")
+            save_dictionary(dictionary, path)
+            loaded = load_dictionary(path)
+            self.assertEqual(loaded.dict_id, 300)
+            self.assertEqual(loaded.lengths, dictionary.lengths)
+            # loading again shares the tables already built
+            self.assertIs(load_dictionary(path), loaded)
+            self.assertIs(get_dictionary(300), loaded)
+
+            blob = compress_with_dictionary(b"hello there", dict_id=300)
+            self.assertEqual(decompress_with_dictionary(blob), b"hello there")
+            with self.assertRaises(ValueError):
+                decompress_with_dictionary(blob, train_dictionary([b"x"], 301))
+            with self.assertRaises(ValueError):
+                decompress_with_dictionary(compress_with_dictionary(b"x", train_dictionary([b"x"], 302)))
+            with self.assertRaises(ValueError):
+                decompress_with_dictionary(blob[:-1])
+
+            with open(path, 'rb') as f:
+                data = f.read()
+            with self.assertRaises(EOFError):
+                HuffmanDictionary.from_bytes(data[:-1])
+            with self.assertRaises(ValueError):
+                HuffmanDictionary.from_bytes(data[:-2] + b"\xff\x08")
+            with self.assertRaises(ValueError):
+                HuffmanDictionary.from_bytes(b"hello")
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,165 @@
+#
+#   Block-parallel compression
+#
+#   The input is cut into blocks of block_size bytes and every block is compressed
+#   on its own by compress, so blocks can be compressed and decompressed on
+#   separate CPU cores and any one block can be decompressed without the others.
+#   Container layout (all integers are 8 byte big-endian):
+#       FORMAT_MAGIC, version byte FORMAT_BLOCKS
+#       block size, number of blocks
+#       index: (original length, compressed length) of every block
+#       the compressed blocks, one after the other
+#
+
+import collections
+import concurrent.futures
+import io
+import os
+import struct
+
+from huffman import *
+
+PARALLEL_BLOCK_SIZE = 1 << 20   # bytes of input per block
+
+CONTAINER_HEADER = struct.Struct('>QQ')
+INDEX_ENTRY = struct.Struct('>QQ')
+
+
+def run_in_pool(func, items, workers):
+    '''Yields func(item) for every item, in order. With more than one worker the calls run in a
+    process pool and at most two per worker are in flight, so items can come from a generator
+    over a file without all of it being read into memory'''
+    if workers == 1:
+        for item in items:
+            yield func(item)
+        return
+    with concurrent.futures.ProcessPoolExecutor(workers) as pool:
+        pending = collections.deque()
+        for item in items:
+            pending.append(pool.submit(func, item))
+            if len(pending) >= 2 * workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def pack_container_header(block_size, index):
+    '''Returns the container header and index for a list of (original length, compressed length) pairs'''
+    parts = [FORMAT_MAGIC, bytes([FORMAT_BLOCKS]), CONTAINER_HEADER.pack(block_size, len(index))]
+    for entry in index:
+        parts.append(INDEX_ENTRY.pack(*entry))
+    return b"".join(parts)
+
+
+def read_block_index(file):
+    '''Reads the header of a block container from a binary file object positioned at its start.
+    Returns (block size, list of (original offset, original length, file offset, compressed length))'''
+    start = file.tell()
+    prefix = file.read(len(FORMAT_MAGIC) + 1 + CONTAINER_HEADER.size)
+    if prefix[:len(FORMAT_MAGIC)] != FORMAT_MAGIC or len(prefix) < len(FORMAT_MAGIC) + 1 + CONTAINER_HEADER.size:
+        raise ValueError("not a Huffman block container")
+    if prefix[len(FORMAT_MAGIC)] != FORMAT_BLOCKS:
+        raise ValueError("unsupported compressed format version " + str(prefix[len(FORMAT_MAGIC)]))
+    block_size, count = CONTAINER_HEADER.unpack(prefix[len(FORMAT_MAGIC) + 1:])
+    table = file.read(count * INDEX_ENTRY.size)
+    if len(table) != count * INDEX_ENTRY.size:
+        raise ValueError("block container index is cut short")
+
+    index = []
+    raw_offset = 0
+    file_offset = start + len(prefix) + len(table)
+    for entry in INDEX_ENTRY.iter_unpack(table):
+        index.append((raw_offset, entry[0], file_offset, entry[1]))
+        raw_offset += entry[0]
+        file_offset += entry[1]
+    return block_size, index
+
+
+def compress_piece(piece):
+    '''Returns (original length, compressed bytes) for piece, an (original length, block) pair'''
+    length, block = piece
+    return length, compress(block)
+
+
+def compress_blocks(data, block_size=PARALLEL_BLOCK_SIZE, workers=None):
+    '''Compresses bytes-like data into a block container and returns it as bytes.
+    workers is the number of processes to use, all CPU cores by default'''
+    if workers is None:
+        workers = os.cpu_count() or 1
+    view = memoryview(data)
+    pieces = (view[start:start + block_size].tobytes() for start in range(0, len(view), block_size))
+    blocks = list(run_in_pool(compress, pieces, workers))
+    index = [(min(block_size, len(view) - i * block_size), len(blocks[i])) for i in range(len(blocks))]
+    return pack_container_header(block_size, index) + b"".join(blocks)
+
+
+def decompress_blocks(blob, workers=None):
+    '''Returns the bytes stored in a block container made by compress_blocks'''
+    if workers is None:
+        workers = os.cpu_count() or 1
+    view = memoryview(blob)
+    block_size, index = read_block_index(io.BytesIO(blob))
+    pieces = (view[offset:offset + length].tobytes() for _, _, offset, length in index)
+    return b"".join(run_in_pool(decompress, pieces, workers))
+
+
+def huffman_encode_parallel(in_file, compressed_file, block_size=PARALLEL_BLOCK_SIZE, workers=None):
+    '''Compresses the bytes of in_file into a block container in compressed_file, using
+    workers processes (all CPU cores by default). Only a few blocks are held in memory at once'''
+    if workers is None:
+        workers = os.cpu_count() or 1
+    size = os.path.getsize(in_file)
+    count = (size + block_size - 1) // block_size
+
+    def pieces():
+        with open(in_file, 'rb') as f:
+            while True:
+                block = f.read(block_size)
+                if block == b"":
+                    return
+                yield len(block), block
+
+    with open(compressed_file, 'wb') as out:
+        # the index is written once the compressed sizes are known
+        out.write(pack_container_header(block_size, [(0, 0)] * count))
+        index = []
+        # the lengths are those actually read, a file that changes meanwhile cannot skew them
+        for length, block in run_in_pool(compress_piece, pieces(), workers):
+            index.append((length, len(block)))
+            out.write(block)
+        if len(index) != count:
+            raise ValueError(str(in_file) + " changed size while it was compressed")
+        out.seek(0)
+        out.write(pack_container_header(block_size, index))
+
+
+def huffman_decode_parallel(compressed_file, decode_file, workers=None):
+    '''Decompresses a block container file made by huffman_encode_parallel into decode_file'''
+    if workers is None:
+        workers = os.cpu_count() or 1
+    with open(compressed_file, 'rb') as f:
+        block_size, index = read_block_index(f)
+
+        def pieces():
+            for _, _, offset, length in index:
+                f.seek(offset)
+                yield f.read(length)
+
+        with open(decode_file, 'wb') as out:
+            for data in run_in_pool(decompress, pieces(), workers):
+                out.write(data)
+
+
+def decompress_range(compressed_file, start, length):
+    '''Returns length bytes of the original data starting at offset start, decompressing
+    only the blocks of a block container file that hold them'''
+    with open(compressed_file, 'rb') as f:
+        block_size, index = read_block_index(f)
+        parts = []
+        for raw_offset, raw_length, offset, comp_length in index:
+            if raw_offset + raw_length <= start or raw_offset >= start + length:
+                continue
+            f.seek(offset)
+            data = decompress(f.read(comp_length))
+            parts.append(data[max(start - raw_offset, 0):start + length - raw_offset])
+    return b"".join(parts)
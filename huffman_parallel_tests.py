@@ -0,0 +1,46 @@
+import unittest
+import os
+import tempfile
+from huffman_parallel import *
+
+
+class TestParallel(unittest.TestCase):
+
+    def test_compress_blocks(self):
+        with open("declaration.txt", 'rb') as f:
+            data = f.read()
+        for workers in [1, 2]:
+            blob = compress_blocks(data, 1000, workers)
+            self.assertEqual(decompress_blocks(blob, workers), data)
+        self.assertEqual(decompress_blocks(compress_blocks(b"", 1000, 1), 1), b"")
+
+        block_size, index = read_block_index(io.BytesIO(blob))
+        self.assertEqual(block_size, 1000)
+        self.assertEqual(len(index), 9)
+        self.assertEqual(index[-1][1], len(data) - 8000)
+
+        with self.assertRaises(ValueError):
+            read_block_index(io.BytesIO(b"97 3\n"))
+
+    def test_encode_decode_files(self):
+        with open("declaration.txt", 'rb') as f:
+            data = f.read()
+        with tempfile.TemporaryDirectory() as tmp:
+            compressed = os.path.join(tmp, "compressed.txt")
+            decoded = os.path.join(tmp, "decoded.txt")
+            huffman_encode_parallel("declaration.txt", compressed, 512, 2)
+            huffman_decode_parallel(compressed, decoded, 2)
+            with open(decoded, 'rb') as f:
+                self.assertEqual(f.read(), data)
+
+            self.assertEqual(decompress_range(compressed, 700, 2000), data[700:2700])
+            self.assertEqual(decompress_range(compressed, len(data) - 10, 100), data[-10:])
+            self.assertEqual(decompress_range(compressed, 0, 0), b"")
+            with open(compressed, 'rb') as f:
+                index = read_block_index(f)[1]
+            self.assertEqual([length for _, length, _, _ in index], [len(data[i:i + 512]) for i in range(0, len(data), 512)])
+        self.assertEqual(compress_piece((4, b"text")), (4, compress(b"text")))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+#
+#   Opt-in timing and counting of the stages of encoding and decoding
+#
+#   Nothing is measured unless an observer is registered with add_observer (or
+#   inside a `with profile() as stats:` block). Without observers start_recording
+#   hands back NULL_RECORDER, whose methods do nothing, so the instrumented code
+#   pays only for a few empty calls.
+#
+#   Each instrumented call sends its observers one event, a dict like
+#       {"operation": "huffman_encode", "seconds": 0.8,
+#        "stages": {"count": 0.2, "tree": 0.001, "emit": 0.4, "write": 0.1, "read": 0.1},
+#        "alloc_bytes": {...},       only when tracemalloc is tracing
+#        "bytes_in": 3463816, "bytes_out": 1902316, "bits": 15216092, "symbols": 3365510}
+#   Stage times are exclusive: time spent in a nested stage is not counted twice.
+#
+
+import contextlib
+import threading
+import time
+import tracemalloc
+
+observers = []   # callbacks that receive every event
+
+
+def add_observer(callback):
+    '''Registers callback(event) to be called after every instrumented encode or decode'''
+    observers.append(callback)
+
+
+def remove_observer(callback):
+    '''Stops sending events to callback'''
+    observers.remove(callback)
+
+
+@contextlib.contextmanager
+def profile(track_allocations=False):
+    '''Collects the events of the calls made inside the with block into a StatsAggregator.
+    With track_allocations=True tracemalloc runs for the block and every stage also
+    reports how many traced bytes it left allocated'''
+    stats = StatsAggregator()
+    add_observer(stats)
+    started = track_allocations and not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start()
+    try:
+        yield stats
+    finally:
+        if started:
+            tracemalloc.stop()
+        remove_observer(stats)
+
+
+def start_recording(operation):
+    '''Returns a Recorder for one call of operation, or NULL_RECORDER when nobody is listening'''
+    if not observers:
+        return NULL_RECORDER
+    return Recorder(operation)
+
+
+class Recorder:
+    '''Times the stages of one call and sends the event to the observers when it finishes'''
+
+    def __init__(self, operation):
+        self.operation = operation
+        self.begin = time.perf_counter()
+        self.stages = {}
+        self.allocs = {}
+        self.counts = {"bytes_in": 0, "bytes_out": 0, "bits": 0, "symbols": 0}
+        self.tracing = tracemalloc.is_tracing()
+        self.stack = []      # [stage, start time, time spent in nested stages, traced bytes at start]
+        self.pending = None
+
+    def __bool__(self):
+        return True
+
+    def time(self, stage):
+        '''Use as `with recorder.time("stage"):` to add the time of the block to stage'''
+        self.pending = stage
+        return self
+
+    def __enter__(self):
+        alloc = tracemalloc.get_traced_memory()[0] if self.tracing else 0
+        self.stack.append([self.pending, time.perf_counter(), 0.0, alloc])
+        return self
+
+    def __exit__(self, *exc):
+        stage, start, nested, alloc = self.stack.pop()
+        elapsed = time.perf_counter() - start
+        self.stages[stage] = self.stages.get(stage, 0.0) + elapsed - nested
+        if self.tracing:
+            self.allocs[stage] = self.allocs.get(stage, 0) + tracemalloc.get_traced_memory()[0] - alloc
+        if self.stack:
+            self.stack[-1][2] += elapsed
+        return False
+
+    def timed(self, stage, iterable):
+        '''Yields the items of iterable, adding the time taken to produce each one to stage'''
+        iterator = iter(iterable)
+        while True:
+            with self.time(stage):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def count(self, **counts):
+        '''Adds to the bytes_in, bytes_out, bits and symbols counters'''
+        for name, value in counts.items():
+            self.counts[name] += value
+
+    def finish(self):
+        '''Sends the event for this call to every observer'''
+        event = {"operation": self.operation, "seconds": time.perf_counter() - self.begin, "stages": self.stages}
+        if self.tracing:
+            event["alloc_bytes"] = self.allocs
+        event.update(self.counts)
+        for callback in list(observers):
+            callback(event)
+
+
+class NullRecorder:
+    '''Stands in for a Recorder when nobody is listening; every method does nothing'''
+
+    def __bool__(self):
+        return False
+
+    def time(self, stage):
+        return self
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def timed(self, stage, iterable):
+        return iterable
+
+    def count(self, **counts):
+        pass
+
+    def finish(self):
+        pass
+
+
+NULL_RECORDER = NullRecorder()
+
+
+class StatsAggregator:
+    '''Observer that sums events per operation. Register it with add_observer (or use profile)
+    and read snapshot() or prometheus_text() whenever the numbers are wanted'''
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.totals = {}
+
+    def __call__(self, event):
+        with self.lock:
+            total = self.totals.setdefault(event["operation"], {
+                "calls": 0, "seconds": 0.0, "bytes_in": 0, "bytes_out": 0, "bits": 0, "symbols": 0,
+                "stages": {}, "alloc_bytes": {}})
+            total["calls"] += 1
+            total["seconds"] += event["seconds"]
+            for name in ("bytes_in", "bytes_out", "bits", "symbols"):
+                total[name] += event[name]
+            for stage, seconds in event["stages"].items():
+                total["stages"][stage] = total["stages"].get(stage, 0.0) + seconds
+            for stage, alloc in event.get("alloc_bytes", {}).items():
+                total["alloc_bytes"][stage] = total["alloc_bytes"].get(stage, 0) + alloc
+
+    def snapshot(self):
+        '''Returns a copy of the totals: operation -> calls, seconds, counters and per-stage seconds'''
+        with self.lock:
+            return {operation: dict(total, stages=dict(total["stages"]), alloc_bytes=dict(total["alloc_bytes"]))
+                    for operation, total in self.totals.items()}
+
+    def reset(self):
+        with self.lock:
+            self.totals = {}
+
+    def prometheus_text(self):
+        '''Returns the totals in the Prometheus text exposition format'''
+        lines = []
+        for operation, total in sorted(self.snapshot().items()):
+            label = 'operation="' + operation + '"'
+            lines.append("huffman_calls_total{" + label + "} " + str(total["calls"]))
+            lines.append("huffman_seconds_total{" + label + "} " + repr(total["seconds"]))
+            for name in ("bytes_in", "bytes_out", "bits", "symbols"):
+                lines.append("huffman_" + name + "_total{" + label + "} " + str(total[name]))
+            for stage, seconds in sorted(total["stages"].items()):
+                lines.append("huffman_stage_seconds_total{" + label + ',stage="' + stage + '"} ' + repr(seconds))
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,160 @@
+#
+#   Four-stream blocks, in the style of huff0
+#
+#   The characters are cut into runs of (almost) equal length, STREAM_COUNT of them
+#   by default, coded with one shared code table into separate byte-aligned streams.
+#   Format version 5 (FORMAT_STREAMS) stores:
+#       the canonical header          as in version 1, with version byte 5
+#       the jump table                the number of streams, then the byte length of every
+#                                     stream but the last, all unsigned LEB128
+#       the streams, one after the other
+#   Stream i holds stream_counts(number of characters)[i] characters. As every
+#   stream starts at a known offset with a fresh state, the streams can be
+#   decoded side by side, on separate processes.
+#
+
+import concurrent.futures
+import threading
+
+from huffman_table_decoder import *
+from huffman_canonical import *
+from huffman_cache import *
+
+STREAM_COUNT = 4
+PARALLEL_STREAM_SIZE = 1 << 18   # bytes a stream needs before it is worth sending to another process
+
+stream_decoders = HuffmanCache(16)   # decoders built by decode_stream, kept per process
+stream_pools = {}                    # workers -> process pool, see stream_pool
+stream_pools_lock = threading.Lock()
+
+
+def stream_counts(numchars, streams=STREAM_COUNT):
+    '''Returns the number of characters in each stream: numchars / streams rounded up,
+    and what is left for the last ones'''
+    size = (numchars + streams - 1) // streams
+    counts = []
+    for _ in range(streams):
+        counts.append(min(size, numchars))
+        numchars -= counts[-1]
+    return counts
+
+
+def pack_jump_table(sizes):
+    '''Returns the jump table for streams of the given byte lengths'''
+    return pack_uint(len(sizes)) + b"".join(pack_uint(size) for size in sizes[:-1])
+
+
+def read_jump_table(cursor):
+    '''Reads a jump table from a BlockCursor and returns the byte lengths of all streams
+    but the last'''
+    streams = read_uint(cursor)
+    if streams < 1:
+        raise ValueError("multi-stream block without streams")
+    return [read_uint(cursor) for _ in range(streams - 1)]
+
+
+class BlockCursor:
+    '''Hands out the bytes of an iterable of bytes-like blocks, such as the memory mapped
+    blocks of HuffmanBitReader.mapped_blocks, in pieces of any size without joining them.
+    read_bits reads whole bytes, like HuffmanBitReader.read_bits, so read_uint works on it'''
+
+    def __init__(self, blocks):
+        self.blocks = iter(blocks)
+        self.block = b""
+        self.pos = 0
+
+    def next_block(self):
+        '''Moves on to the next non-empty block, returns False at the end of the blocks'''
+        for block in self.blocks:
+            if len(block):
+                self.block = block
+                self.pos = 0
+                return True
+        self.block = b""
+        self.pos = 0
+        return False
+
+    def read_bits(self, n):
+        value = 0
+        for _ in range(n // 8):
+            if self.pos == len(self.block) and not self.next_block():
+                raise EOFError("multi-stream data ended inside its jump table")
+            value = value << 8 | self.block[self.pos]
+            self.pos += 1
+        return value
+
+    def take(self, size=None):
+        '''Yields the next size bytes, or all that is left when size is None, as memoryview slices
+        of the blocks. Each slice is released when the next one is asked for'''
+        while size is None or size > 0:
+            if self.pos == len(self.block) and not self.next_block():
+                if size is not None:
+                    raise ValueError("multi-stream data ended " + str(size) + " bytes before the end of a stream")
+                return
+            end = len(self.block) if size is None else self.pos + size
+            piece = memoryview(self.block)[self.pos:end]
+            self.pos += len(piece)
+            if size is not None:
+                size -= len(piece)
+            try:
+                yield piece
+            finally:
+                # a live slice would keep the memory map of mapped_blocks from closing
+                piece.release()
+
+
+def decode_stream(job):
+    '''Decodes one stream, job is (code lengths as bytes, stream data, number of characters).
+    Runs in worker processes, which keep the decoders they build'''
+    lengths, data, count = job
+    decoder = stream_decoders.get(lengths, lambda: HuffmanTableDecoder(None, canonical_codes(list(lengths))))
+    return decoder.decode(data, count)
+
+
+def stream_pool(workers):
+    '''Returns the process pool of workers processes shared by every MultiStreamDecoder that
+    is not given one, starting it on first use'''
+    with stream_pools_lock:
+        if workers not in stream_pools:
+            stream_pools[workers] = concurrent.futures.ProcessPoolExecutor(workers)
+        return stream_pools[workers]
+
+
+class MultiStreamDecoder(HuffmanTableDecoder):
+    '''Decodes version 5 data with the tables of an existing HuffmanTableDecoder for the same codes.
+    With workers above 1, large streams are decoded on executor, or on a shared pool of that
+    many processes'''
+
+    def __init__(self, decoder, lengths, workers=1, executor=None):
+        super().__init__(None)
+        self.tree = decoder.tree
+        self.step = decoder.step
+        self.table = decoder.table
+        self.single = decoder.single
+        self.lengths = bytes(lengths)
+        self.workers = workers
+        self.executor = executor
+
+    def decode_blocks(self, blocks, count, skip=0):
+        '''Reads the jump table from blocks and yields the characters of each stream in turn.
+        The streams are sliced out of the blocks as they come, only streams sent to other
+        processes are copied'''
+        if skip:
+            raise ValueError("multi-stream data cannot start inside a byte")
+        cursor = BlockCursor(blocks)
+        sizes = read_jump_table(cursor)
+        counts = stream_counts(count, len(sizes) + 1)
+        if self.workers > 1 and sum(sizes) >= PARALLEL_STREAM_SIZE * len(sizes):
+            executor = self.executor or stream_pool(self.workers)
+            futures = []
+            for size, n in zip(sizes + [None], counts):
+                data = b"".join(bytes(piece) for piece in cursor.take(size))
+                futures.append(executor.submit(decode_stream, (self.lengths, data, n)))
+            for future in futures:
+                yield future.result()
+            return
+        for size, n in zip(sizes + [None], counts):
+            part = cursor.take(size)
+            yield from HuffmanTableDecoder.decode_blocks(self, part, n)
+            for _ in part:
+                pass   # the padding after the last code
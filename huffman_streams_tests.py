@@ -0,0 +1,81 @@
+import unittest
+import concurrent.futures
+import io
+import os
+import random
+import tempfile
+import huffman_streams
+from huffman import *
+
+
+class TestStreams(unittest.TestCase):
+    def test_stream_counts(self):
+        self.assertEqual(stream_counts(10), [3, 3, 3, 1])
+        self.assertEqual(stream_counts(2), [1, 1, 0, 0])
+        self.assertEqual(stream_counts(0), [0, 0, 0, 0])
+        self.assertEqual(sum(stream_counts(1000001)), 1000001)
+        table = pack_jump_table([300, 0, 5, 9])
+        cursor = BlockCursor([table[:1], b"", table[1:2], table[2:] + bytes(100), bytes(214)])
+        self.assertEqual(read_jump_table(cursor), [300, 0, 5])
+        self.assertEqual(b"".join(bytes(piece) for piece in cursor.take(300)), bytes(300))
+        self.assertEqual(list(cursor.take(0)), [])
+        self.assertEqual(b"".join(bytes(piece) for piece in cursor.take(5)), bytes(5))
+        self.assertEqual(b"".join(bytes(piece) for piece in cursor.take()), bytes(9))
+        with self.assertRaises(ValueError):
+            list(BlockCursor([table + bytes(10)]).take(400))
+        with self.assertRaises(EOFError):
+            read_jump_table(BlockCursor([table[:2]]))
+
+    def test_round_trip(self):
+        with open('file_WAP.txt', 'rb') as f:
+            text = f.read()
+        rng = random.Random(5)
+        for data in [text, bytes(rng.randrange(256) for _ in range(5000)), b"", b"a", b"ab", b"zzzzzzz"]:
+            for streams in [2, 3, STREAM_COUNT, 8]:
+                blob = compress(data, streams=streams)
+                self.assertEqual(decompress(blob), data)
+                # the streams hold the same bits as the single stream, plus a little padding and the jump table
+                self.assertLessEqual(len(blob), len(compress(data)) + streams + 1 + 3 * (streams - 1))
+        self.assertEqual(compress(text, streams=1), compress(text))
+        with self.assertRaises(ValueError):
+            compress(text, streams=0)
+
+        out = io.BytesIO()
+        compress_file(io.BytesIO(text), out, streams=STREAM_COUNT)
+        self.assertEqual(out.getvalue(), compress(text, streams=STREAM_COUNT))
+        with tempfile.TemporaryDirectory() as tmp:
+            compressed = os.path.join(tmp, 'streams_compressed.txt')
+            decoded = os.path.join(tmp, 'streams_decoded.txt')
+            with open(compressed, 'wb') as f:
+                f.write(out.getvalue())
+            huffman_decode(compressed, decoded, binary=True)
+            with open(decoded, 'rb') as f:
+                self.assertEqual(f.read(), text)
+
+    def test_workers(self):
+        with open('declaration.txt', 'rb') as f:
+            text = f.read()
+        blob = compress(text, streams=STREAM_COUNT)
+        size = huffman_streams.PARALLEL_STREAM_SIZE
+        huffman_streams.PARALLEL_STREAM_SIZE = 1
+        try:
+            self.assertEqual(decompress(blob, workers=2), text)
+            self.assertEqual(decompress(blob, workers=2), text)
+            with concurrent.futures.ThreadPoolExecutor(2) as executor:
+                self.assertEqual(decompress(compress(text, streams=3), workers=2, executor=executor), text)
+                with tempfile.TemporaryDirectory() as tmp:
+                    encoded = os.path.join(tmp, "streams.huf")
+                    decoded = os.path.join(tmp, "decoded.txt")
+                    with open(encoded, 'wb') as f:
+                        f.write(blob)
+                    huffman_decode(encoded, decoded, binary=True, workers=2, executor=executor)
+                    with open(decoded, 'rb') as f:
+                        self.assertEqual(f.read(), text)
+        finally:
+            huffman_streams.PARALLEL_STREAM_SIZE = size
+        with self.assertRaises(ValueError):
+            decompress(blob[:-20])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,180 @@
+#
+#   Table-driven decoder for Huffman encoded bit streams
+#
+
+import itertools
+
+SINGLE_PIECE = 1 << 16   # characters yielded at a time for a one character alphabet
+
+class HuffmanTableDecoder:
+    '''Decodes a Huffman bit stream one whole byte (8 bits) at a time.
+    The decoder is a state machine whose states are the internal nodes of the Huffman tree.
+    For every state and every possible input byte a lookup table stores the characters
+    completed while walking those 8 bits and the state the walk ends in, so each lookup
+    emits zero or more characters and codes longer than 8 bits simply span several lookups.
+    Output is identical to walking the tree bit by bit'''
+
+    def __init__(self, tree, codes=None):
+        '''Builds the tables from a HuffmanNode tree, or from a list of code strings
+        indexed by character (as returned by create_code) when codes is given'''
+        self.tree = tree
+        self.step = None     # (characters, next state) for bit 0 and bit 1 of every state
+        self.table = None
+        self.single = None   # the character of a one character alphabet, whose code is empty
+        if codes is not None:
+            if any(codes):
+                self.step = self.steps_from_codes(codes)
+                self.table = self.build_table(self.step)
+        elif tree is not None:
+            if tree.left is None and tree.right is None:
+                self.single = tree.char
+            else:
+                self.step = self.steps_from_tree(tree)
+                self.table = self.build_table(self.step)
+
+    def steps_from_tree(self, tree):
+        '''Returns the single bit transitions of the internal nodes of tree, the root is state 0'''
+        internal = []
+        state_of = {}
+        stack = [tree]
+        while stack:
+            node = stack.pop()
+            if node.left is None and node.right is None:
+                continue
+            state_of[id(node)] = len(internal)
+            internal.append(node)
+            stack.append(node.right)
+            stack.append(node.left)
+
+        step = []
+        for node in internal:
+            pair = []
+            for child in (node.left, node.right):
+                if child.left is None and child.right is None:
+                    pair.append((bytes([child.char]), 0))
+                else:
+                    pair.append((b"", state_of[id(child)]))
+            step.append(pair)
+        return step
+
+    def steps_from_codes(self, codes):
+        '''Returns the single bit transitions for a prefix-free list of codes. The states are
+        the proper prefixes of the codes (the internal nodes of the implied tree), "" is state 0'''
+        char_of = {}
+        state_of = {"": 0}
+        for char in range(len(codes)):
+            code = codes[char]
+            if code == "":
+                continue
+            char_of[code] = char
+            for end in range(1, len(code)):
+                if code[:end] not in state_of:
+                    state_of[code[:end]] = len(state_of)
+
+        step = [None] * len(state_of)
+        for prefix, state in state_of.items():
+            pair = []
+            for bit in "01":
+                if prefix + bit in char_of:
+                    pair.append((bytes([char_of[prefix + bit]]), 0))
+                elif prefix + bit in state_of:
+                    pair.append((b"", state_of[prefix + bit]))
+                else:
+                    # an incomplete code (a one character alphabet coded as "0") leaves
+                    # bit patterns that never show up in valid data
+                    pair.append((b"", 0))
+            step[state] = pair
+        return step
+
+    def build_table(self, step):
+        '''Returns a flat list indexed by state * 256 + byte holding (characters, next state * 256) pairs,
+        step holds the (characters, next state) pair for bit 0 and bit 1 of every state'''
+        # 4 bit transitions built from the single bit ones
+        nibble = []
+        for state in range(len(step)):
+            row = []
+            for value in range(16):
+                out = b""
+                current = state
+                for shift in (3, 2, 1, 0):
+                    emitted, current = step[current][(value >> shift) & 1]
+                    out += emitted
+                row.append((out, current))
+            nibble.append(row)
+
+        # 8 bit transitions are two 4 bit transitions back to back
+        table = []
+        for state in range(len(step)):
+            high_row = nibble[state]
+            for byte in range(256):
+                high_out, middle = high_row[byte >> 4]
+                low_out, current = nibble[middle][byte & 15]
+                table.append((high_out + low_out, current * 256))
+        return table
+
+    def decode(self, data, count):
+        '''Decodes count characters from data (bytes-like) and returns them as bytes.
+        Padding bits after the last code are ignored'''
+        return b"".join(self.decode_blocks([data], count))
+
+    def decode_into(self, blocks, count, out):
+        '''Decodes count characters from an iterable of bytes-like blocks straight into out,
+        a writable buffer (bytearray, memoryview, mmap, ...) of at least count bytes.
+        Returns the number of characters written'''
+        pos = 0
+        with memoryview(out) as target:
+            if len(target) < count:
+                raise ValueError("buffer of " + str(len(target)) + " bytes is too small for " + str(count) + " characters")
+            for piece in self.decode_blocks(blocks, count):
+                target[pos:pos + len(piece)] = piece
+                pos += len(piece)
+        return pos
+
+    def decode_blocks(self, blocks, count, skip=0):
+        '''Decodes count characters from an iterable of bytes-like blocks and yields them as
+        bytes, one piece per block. The state carries over from one block to the next.
+        The first skip bits (0 to 7) of the first block are not part of the stream, so decoding
+        can start at any bit offset, such as a sync point of an indexed file'''
+        if count == 0:
+            return
+        if self.single is not None:
+            # a one character alphabet has an empty code, nothing is stored in the bit stream
+            while count > 0:
+                yield bytes([self.single]) * min(count, SINGLE_PIECE)
+                count -= SINGLE_PIECE
+            return
+        if self.table is None:
+            raise ValueError("no code table to decode " + str(count) + " characters with")
+
+        table = self.table
+        base = 0
+        left = count
+        head = b""
+        if skip:
+            # walk the rest of the first byte a bit at a time, then carry on a byte at a time
+            blocks = iter(blocks)
+            for block in blocks:
+                if len(block):
+                    break
+            else:
+                raise ValueError("encoded data ended after 0 of " + str(count) + " characters")
+            state = 0
+            for shift in range(7 - skip, -1, -1):
+                emitted, state = self.step[state][(block[0] >> shift) & 1]
+                head += emitted
+            base = state * 256
+            blocks = itertools.chain([block[1:]], blocks)
+        for block in blocks:
+            out = [head]
+            head = b""
+            append = out.append
+            for byte in block:
+                chunk, base = table[base + byte]
+                append(chunk)
+            piece = b"".join(out)
+            if len(piece) >= left:
+                yield piece[:left]
+                return
+            left -= len(piece)
+            yield piece
+        raise ValueError("encoded data ended after " + str(count - left) + " of " + str(count) + " characters")
@@ -0,0 +1,118 @@
+#
+#   Typed blocks: stored, run or Huffman coded, whichever is smallest
+#
+#   Huffman coding only pays when the bytes are skewed enough to cover the code table.
+#   Near-uniform or tiny blocks come out larger than they went in, and a block of one
+#   repeated byte needs no codes at all. Each block is therefore sized up from its byte
+#   counts before any tree is built: the entropy of the counts is a lower bound for the
+#   coded size, so a block whose bound plus table is no smaller than the block is stored
+#   as it is. Blocks that look worth coding are coded, and still stored if the real codes
+#   turn out no smaller.
+#   File layout (format version 7, FORMAT_TYPED; integers are unsigned LEB128):
+#       FORMAT_MAGIC, version byte FORMAT_TYPED
+#       blocks: the number of characters, the block type, then
+#           BLOCK_STORED      the characters as they are
+#           BLOCK_RUN         the one character the block repeats
+#           BLOCK_HUFFMAN     the code lengths as (run, length) byte pairs, the number of
+#                             bytes of code, the code padded to a whole byte
+#       0, which ends the file
+#
+
+import io
+import math
+
+from huffman import *
+
+TYPED_BLOCK_SIZE = 1 << 16   # most characters in one block
+
+BLOCK_STORED = 0
+BLOCK_RUN = 1
+BLOCK_HUFFMAN = 2
+
+typed_decoders = HuffmanCache(2, CACHE_BYTES)   # kept apart from code_cache, block codes seldom repeat beyond the next block
+
+
+def estimate_bits(freqs):
+    '''Returns the entropy of the byte counts freqs in bits, the fewest bits any code for
+    one character at a time can code them in'''
+    total = sum(freqs)
+    return total * math.log2(total) - sum(freq * math.log2(freq) for freq in freqs if freq) if total else 0.0
+
+
+def choose_block_type(freqs):
+    '''Returns the block type for a block with the byte counts freqs, judged from the counts alone'''
+    distinct = 256 - freqs.count(0)
+    if distinct == 1:
+        return BLOCK_RUN
+    # the code lengths take two bytes per run, with at most one run of 0s around every character
+    table_bytes = 2 * min(256, 2 * distinct + 1) + 2
+    if estimate_bits(freqs) / 8 + table_bytes >= sum(freqs):
+        return BLOCK_STORED
+    return BLOCK_HUFFMAN
+
+
+def encode_block(block):
+    '''Returns the typed block for the bytes-like block, without its number of characters'''
+    freqs = count_bytes(block)
+    block_type = choose_block_type(freqs)
+    if block_type == BLOCK_RUN:
+        return bytes([BLOCK_RUN, block[0]])
+    if block_type == BLOCK_HUFFMAN:
+        lengths, codes = canonical_table(freqs)
+        table = pack_lengths(lengths)
+        code_bytes = (encoded_bits(freqs, lengths) + 7) // 8
+        if len(table) + len(pack_uint(code_bytes)) + code_bytes < len(block):
+            a = HuffmanBitWriter(io.BytesIO())
+            write_chunk(a, block, codes, code_table(codes, None))
+            a.close()
+            return bytes([BLOCK_HUFFMAN]) + table + pack_uint(code_bytes) + a.file.getvalue()
+    return bytes([BLOCK_STORED]) + bytes(block)
+
+
+def compress_typed_file(in_f, out_f, block_size=TYPED_BLOCK_SIZE):
+    '''Compresses the binary file object in_f into the binary file object out_f in typed blocks
+    of block_size characters. in_f is read once, a block at a time'''
+    out_f.write(FORMAT_MAGIC + bytes([FORMAT_TYPED]))
+    for block in iter(lambda: in_f.read(block_size), b""):
+        out_f.write(pack_uint(len(block)))
+        out_f.write(encode_block(block))
+    out_f.write(pack_uint(0))
+
+
+def decompress_typed_file(in_f, out_f):
+    '''Decompresses a file written by compress_typed_file from the binary file object in_f into out_f.
+    Stored blocks are copied straight through, without touching a decoder'''
+    if in_f.read(len(FORMAT_MAGIC) + 1) != FORMAT_MAGIC + bytes([FORMAT_TYPED]):
+        raise ValueError("not a typed block Huffman file")
+    reader = ByteReader(in_f)
+    while True:
+        count = read_uint(reader)
+        if count == 0:
+            return
+        block_type = reader.read(1)[0]
+        if block_type == BLOCK_STORED:
+            out_f.write(reader.read(count))
+        elif block_type == BLOCK_RUN:
+            out_f.write(reader.read(1) * count)
+        elif block_type == BLOCK_HUFFMAN:
+            lengths = read_lengths(reader)
+            code = reader.read(read_uint(reader))
+            decoder = typed_decoders.get(("lengths", bytes(lengths)),
+                                         lambda: HuffmanTableDecoder(None, canonical_codes(lengths)))
+            out_f.write(decoder.decode(code, count))
+        else:
+            raise ValueError("unknown block type " + str(block_type))
+
+
+def compress_typed(data, block_size=TYPED_BLOCK_SIZE):
+    '''Compresses bytes-like data in typed blocks and returns the compressed bytes'''
+    out = io.BytesIO()
+    compress_typed_file(io.BytesIO(data), out, block_size)
+    return out.getvalue()
+
+
+def decompress_typed(blob):
+    '''Returns the original bytes of a blob made by compress_typed'''
+    out = io.BytesIO()
+    decompress_typed_file(io.BytesIO(blob), out)
+    return out.getvalue()
@@ -0,0 +1,69 @@
+import unittest
+import io
+import random
+from huffman_typed import *
+
+
+class TestTyped(unittest.TestCase):
+
+    def test_block_types(self):
+        rng = random.Random(2)
+        uniform = bytes(rng.randrange(256) for _ in range(5000))
+        with open("declaration.txt", 'rb') as f:
+            text = f.read()
+        self.assertEqual(choose_block_type(count_bytes(b"x" * 1000)), BLOCK_RUN)
+        self.assertEqual(choose_block_type(count_bytes(uniform)), BLOCK_STORED)
+        self.assertEqual(choose_block_type(count_bytes(b"hello")), BLOCK_STORED)
+        self.assertEqual(choose_block_type(count_bytes(text)), BLOCK_HUFFMAN)
+        self.assertEqual(estimate_bits(count_bytes(b"abab")), 4.0)
+        self.assertEqual(estimate_bits([0]*256), 0.0)
+
+        self.assertEqual(encode_block(b"x" * 1000), bytes([BLOCK_RUN]) + b"x")
+        self.assertEqual(encode_block(uniform), bytes([BLOCK_STORED]) + uniform)
+        self.assertEqual(encode_block(text)[0], BLOCK_HUFFMAN)
+
+    def test_round_trip(self):
+        rng = random.Random(4)
+        with open("file_WAP.txt", 'rb') as f:
+            text = f.read(300000)
+        uniform = bytes(rng.randrange(256) for _ in range(3000))
+        mixed = text[:70000] + b"\0" * 70000 + uniform + b"z"
+        for data in [b"", b"a", b"hello", b"a" * 200000, uniform, text, mixed]:
+            for block_size in [1000, TYPED_BLOCK_SIZE]:
+                blob = compress_typed(data, block_size)
+                self.assertEqual(decompress_typed(blob), data)
+                # no block is ever larger than the bytes it holds plus its type and size
+                blocks = (len(data) + block_size - 1) // block_size
+                self.assertLessEqual(len(blob), len(data) + 5 + blocks * 4)
+        self.assertLess(len(compress_typed(b"hello")), len(compress(b"hello")))
+        # per block codes stay out of the shared code_cache
+        code_cache.clear()
+        decompress_typed(compress_typed(mixed, 1000))
+        self.assertEqual(code_cache.stats()["size"], 0)
+        self.assertLess(len(compress_typed(uniform)), len(compress(uniform)))
+
+    def test_bad_input(self):
+        blob = compress_typed(b"some text, some more text" * 20)
+        for bad in [compress(b"text"), blob[:6] + bytes([9]) + blob[7:], blob[:7] + b"\0" + blob[8:]]:
+            with self.assertRaises(ValueError):
+                decompress_typed(bad)
+        # cut off files end the same way as cut off canonical headers
+        for cut in [blob[:-1], blob[:-5], blob[:9]]:
+            with self.assertRaises(EOFError):
+                decompress_typed(cut)
+
+    def test_byte_reader(self):
+        data = pack_uint(300) + pack_lengths([3] * 200 + [0] * 56) + b"rest"
+        for source in [data, io.BytesIO(data)]:
+            reader = ByteReader(source)
+            self.assertEqual(read_uint(reader), 300)
+            self.assertEqual(read_lengths(reader), [3] * 200 + [0] * 56)
+            self.assertEqual(reader.read(4), b"rest")
+            with self.assertRaises(EOFError):
+                reader.read(1)
+        self.assertEqual(unpack_uint(data, 0), (300, 2))
+        self.assertEqual(unpack_uint(data[:1], 0), (None, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()